@@ -0,0 +1,205 @@
+"""Benchmark of the soundRadar capture-to-pixel pipeline.
+
+Synthetic 2/6/8 channels recordings with a known directional source are run
+through every stage of the radar (capture, getMaxSound, initfilter, sector
+engine, strength, paint) and through the headless replay for the end-to-end
+detection latency. Results are written as JSON so runs of different versions
+can be compared:
+
+    python benchmark.py --out bench.json
+    python benchmark.py --out new.json --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen') # paint without a display
+
+import numpy as np
+
+import radarCore as radar
+
+SAMPLERATE = 48000
+BLOCKSIZE = 512
+
+# speaker layout and source used for each channel count: (radar.LAYOUTS key, source channel, expected sectors)
+# (None = the default sector table over the 7.1 mapping, a side source lights the 3 sectors around it)
+LAYOUTS = {
+    2: ('stereo', 1, [1]),
+    6: ('5.1', 0, [11]),
+    8: (None, 7, [2, 3, 4]),
+}
+
+
+def syntheticSignal(n_chans, seconds, source, onset=1.0, period=0.5, seed=0):
+    """int32 recording with a noise floor on every channel and short decaying
+    bursts (gunshot like) on the source channel every `period` from `onset`"""
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * SAMPLERATE)
+    scale = 2. ** 31 - 1
+    data = rng.standard_normal((frames, n_chans)) * 1e-4
+    burst = int(0.02 * SAMPLERATE)
+    envelope = np.exp(-np.arange(burst) / (0.004 * SAMPLERATE))
+    for start in np.arange(onset, seconds, period):
+        i = int(start * SAMPLERATE)
+        n = min(burst, frames - i)
+        data[i:i + n, source] += 0.6 * envelope[:n] * rng.standard_normal(n)
+    return np.clip(data * scale, -scale, scale).astype(np.int32)
+
+
+def rate(fn, repeat=5, minTime=0.2):
+    """Best calls per second of fn over a few repeats"""
+    best = 0.
+    for _ in range(repeat):
+        n = 0
+        t0 = time.perf_counter()
+        while True:
+            fn()
+            n += 1
+            elapsed = time.perf_counter() - t0
+            if elapsed >= minTime:
+                break
+        best = max(best, n / elapsed)
+    return best
+
+
+def useLayout(n_chans):
+    layout, source, sectors = LAYOUTS[n_chans]
+    radar.speakerLayout = layout
+    if layout is None:
+        radar.sectorEngine = radar.SectorEngine(radar.SECTOR_TABLE, radar.mapping, radar.prevmax)
+    else:
+        radar.sectorEngine = radar.SectorEngine.fromLayout(radar.LAYOUTS[layout], len(radar.prevmax),
+                                                           radar.layoutSharpness, radar.prevmax)
+    radar.n_channel = n_chans
+    radar.maxSoundValue = radar.fullScale(np.int32)
+    return source, sectors
+
+
+def benchStages(n_chans, seconds):
+    source, _ = useLayout(n_chans)
+    data = syntheticSignal(n_chans, seconds, source)
+    blocks = [data[i:i + BLOCKSIZE] for i in range(0, len(data) - BLOCKSIZE, BLOCKSIZE)]
+    blocksPerTick = max(1, int(radar.refreshtime * SAMPLERATE / BLOCKSIZE))
+    results = {}
+
+    ring = radar.RingBuffer(SAMPLERATE, n_chans, np.int32)
+    reducer = radar.BlockReducer(n_chans)
+    for name, capture in (('ring', ring), ('reducer', reducer)):
+        i = iter(range(10 ** 12))
+        results[f'capture_{name}_blocks_per_s'] = rate(lambda: capture.write(blocks[next(i) % len(blocks)]))
+
+        def drain():
+            for block in blocks[:blocksPerTick]:
+                capture.write(block)
+            radar.getMaxSound(n_chans)
+        radar.capture = capture
+        results[f'getMaxSound_{name}_ticks_per_s'] = rate(drain)
+
+    values = np.abs(data[:BLOCKSIZE].max(axis=0)) / radar.maxSoundValue
+    results['initfilter_ticks_per_s'] = rate(lambda: radar.initfilter(values.copy(), radar.minThreshold))
+    filtered = radar.initfilter(values.copy(), radar.minThreshold)
+    tick = iter(range(10 ** 12))
+    results['sector_engine_ticks_per_s'] = rate(lambda: radar.sectorEngine.update(filtered, next(tick) * radar.refreshtime))
+
+    results['strength_ticks_per_s'] = rate(lambda: radar.sectorStrengths(radar.prevmax, 0.1))
+    return results
+
+
+def benchPaint(frames=200, size=700):
+    from PyQt5 import QtWidgets
+    import radarGui
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    window = radarGui.ParentWidget()
+    window.resize(size, size)
+    window.show()
+    app.processEvents()
+    rng = np.random.default_rng(0)
+    strengths = rng.random((frames, len(radar.prevmax)))
+    times = []
+    for frame in strengths:
+        t0 = time.perf_counter()
+        window.updateSectors(frame) # same path as the live tick
+        app.processEvents() # paint the dirty arcs only, as the event loop does
+        times.append(time.perf_counter() - t0)
+    window.close()
+    times = np.array(times) * 1000
+    return {'paint_ms_per_frame_p50': float(np.percentile(times, 50)),
+            'paint_ms_per_frame_p95': float(np.percentile(times, 95))}
+
+
+def benchEndToEnd(n_chans, seconds):
+    source, sectors = useLayout(n_chans)
+    onset = 1.0
+    data = syntheticSignal(n_chans, seconds, source, onset=onset, period=seconds)
+    t0 = time.perf_counter()
+    timeline = radar.replayAudio(radar.arrayChunks(data, BLOCKSIZE), SAMPLERATE, n_chans,
+                                 radar.fullScale(np.int32), BLOCKSIZE)
+    elapsed = time.perf_counter() - t0
+    detected = np.flatnonzero((timeline[:, 0] >= onset) & (timeline[:, 1:].max(axis=1) > 0))
+    results = {'replay_realtime_factor': seconds / elapsed,
+               'timeline_monotonic': bool(np.all(np.diff(timeline[:, 0]) >= 0))}
+    if len(detected):
+        row = timeline[detected[0]]
+        results['detection_latency_ms'] = (row[0] - onset) * 1000
+        results['detected_sector'] = int(np.argmax(row[1:]))
+        results['direction_ok'] = results['detected_sector'] in sectors
+    else:
+        results['detection_latency_ms'] = None
+    return results
+
+
+def gitVersion():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous):
+    """Print the ratio of every metric against a previous run"""
+    for group, metrics in results['results'].items():
+        for name, value in metrics.items():
+            old = previous.get('results', {}).get(group, {}).get(name)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                print(f"{group:>10} {name:<36} {old:>14.4g} -> {value:<14.4g} x{value / old:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the soundRadar pipeline')
+    parser.add_argument('--out', default='bench_output.json', help='JSON result file (default: bench_output.json)')
+    parser.add_argument('--seconds', type=float, default=10., help='length of the synthetic recordings (default: 10)')
+    parser.add_argument('--compare', metavar='FILE', help='previous JSON result to compare with')
+    parser.add_argument('--no-paint', action='store_true', help='skip the Qt paint benchmark')
+    args = parser.parse_args()
+
+    radar.DEBUG = False
+    results = {}
+    for n_chans in sorted(LAYOUTS):
+        results[f'{n_chans}ch'] = benchStages(n_chans, args.seconds)
+        results[f'{n_chans}ch'].update(benchEndToEnd(n_chans, args.seconds))
+    if not args.no_paint:
+        results['paint'] = benchPaint()
+    output = {
+        'version': gitVersion(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'refreshtime': radar.refreshtime,
+        'blocksize': BLOCKSIZE,
+        'samplerate': SAMPLERATE,
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
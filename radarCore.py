@@ -0,0 +1,1437 @@
+"""Core of soundRadar: capture, sector engine and replay.
+
+Only depends on NumPy, so it can be imported without Qt or PortAudio
+(sounddevice is imported when a stream is opened).
+"""
+import sys
+import os
+import json
+from multiprocessing import shared_memory
+import threading
+import queue
+import struct
+import math
+import numpy as np
+import time
+
+class RingBuffer:
+    """Preallocated single-producer/single-consumer ring buffer of audio frames.
+
+    The audio callback copies each block into the buffer without allocating and
+    the process side reduces over every unread frame at once. Only the producer
+    moves `written` and only the consumer moves `read`, so no lock is needed.
+    """
+    def __init__(self, capacity, n_chans, dtype):
+        self.capacity = capacity
+        self.buffer = np.zeros((capacity, n_chans), dtype=dtype)
+        self.written = 0 # total number of frames written (producer side)
+        self.read = 0 # total number of frames consumed (consumer side)
+        self.overruns = 0 # number of reads where unread frames were overwritten
+
+    def write(self, block):
+        n = len(block)
+        if n > self.capacity:
+            # only the most recent frames fit in the buffer
+            self.written += n - self.capacity
+            block = block[-self.capacity:]
+            n = self.capacity
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        if first < n:
+            self.buffer[:n - first] = block[first:]
+        # publish the frames only once they are copied
+        self.written += n
+
+    def readMax(self):
+        """Return the per-channel max over all unread frames (None if there is none)"""
+        written = self.written
+        n = written - self.read
+        if n == 0:
+            return None
+        if n > self.capacity:
+            self.overruns += 1
+            n = self.capacity
+        start = (written - n) % self.capacity
+        if start + n <= self.capacity:
+            maxVals = self.buffer[start:start + n].max(axis=0)
+        else:
+            maxVals = np.maximum(self.buffer[start:].max(axis=0),
+                                 self.buffer[:start + n - self.capacity].max(axis=0))
+        self.read = written
+        return maxVals
+
+    def latest(self, out):
+        """Copy the last len(out) frames into out without consuming them (False if not written yet)"""
+        n = len(out)
+        written = self.written
+        if written < n or n > self.capacity:
+            return False
+        start = (written - n) % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:] = self.buffer[:n - first]
+        return True
+
+
+class BlockReducer:
+    """Per-channel peak/RMS reduction done directly in the audio callback.
+
+    Each block is reduced to a few values per channel into one of two small
+    accumulators, so whole blocks never leave the audio thread. The process side
+    swaps the accumulators and reads the finished one (same `readMax` interface
+    as RingBuffer). The RMS (`rms`) is only accumulated when asked for.
+    """
+    def __init__(self, n_chans, rms=False):
+        self.n_chans = n_chans
+        self.useRms = rms
+        self.peak = np.zeros((2, n_chans))
+        self.sumsq = np.zeros((2, n_chans))
+        self.frames = [0, 0]
+        self.active = 0 # accumulator written by the callback
+        self.busy = False # True while the callback is writing
+        self.rms = np.zeros(n_chans) # RMS of the last read
+        # scratch arrays, so the callback does not allocate
+        self._tmp = np.zeros(n_chans)
+        self._columns = np.zeros((n_chans, 0))
+        self._square = np.zeros((n_chans, 0))
+
+    def write(self, block):
+        self.busy = True
+        slot = self.active
+        frames = len(block)
+        if frames > self._columns.shape[1] or block.dtype != self._columns.dtype:
+            # only happens for the first (or a larger) block
+            self._columns = np.zeros((self.n_chans, frames), dtype=block.dtype)
+            self._square = np.zeros((self.n_chans, frames))
+        # one copy with the channels contiguous: reducing along them is much faster than across the frames
+        columns = self._columns[:, :frames]
+        columns[:] = block.T
+        np.max(columns, axis=1, out=self._tmp)
+        np.maximum(self.peak[slot], self._tmp, out=self.peak[slot])
+        if self.useRms:
+            square = self._square[:, :frames]
+            np.square(columns, out=square, dtype=np.float64)
+            np.sum(square, axis=1, out=self._tmp)
+            self.sumsq[slot] += self._tmp
+        self.frames[slot] += frames
+        self.busy = False
+
+    def readMax(self):
+        """Swap the accumulators and return the per-channel max of the finished one"""
+        slot = self.active
+        self.active = 1 - slot
+        # wait for a callback which started before the swap
+        while self.busy:
+            time.sleep(0)
+        frames = self.frames[slot]
+        if frames == 0:
+            return None
+        maxVals = self.peak[slot].copy()
+        if self.useRms:
+            np.sqrt(self.sumsq[slot] / frames, out=self.rms)
+            self.sumsq[slot] = 0
+        self.peak[slot] = 0
+        self.frames[slot] = 0
+        return maxVals
+
+
+class OnsetDetector:
+    """Per-channel energy jump detection in the audio callback.
+
+    The mean square of each block is compared to a running average per channel.
+    On a jump, `onOnset` is called (from the audio thread) so the radar is
+    updated right away instead of waiting for the next tick.
+    """
+    def __init__(self, n_chans, ratio=4.0, floor=1e-5, alpha=0.05, holdoff=0.03, onOnset=None):
+        self.onOnset = onOnset
+        self.n_chans = n_chans
+        self.ratio = ratio
+        self.floor = floor * maxSoundValue ** 2 # floor is given on normalized energy
+        self.alpha = alpha
+        self.holdoff = holdoff
+        self.average = np.zeros(n_chans)
+        self.energy = np.zeros(n_chans)
+        self.lastOnset = 0.
+        self.onsets = 0
+        self._square = np.zeros((0, n_chans))
+
+    def process(self, block, now=None):
+        frames = len(block)
+        if frames == 0:
+            return False
+        if frames > len(self._square):
+            self._square = np.zeros((frames, self.n_chans))
+        square = self._square[:frames]
+        np.square(block, out=square, dtype=np.float64)
+        np.mean(square, axis=0, out=self.energy)
+        jump = np.any((self.energy > self.ratio * self.average) & (self.energy > self.floor))
+        self.average += self.alpha * (self.energy - self.average)
+        if jump:
+            if now is None:
+                now = time.perf_counter()
+            if now - self.lastOnset >= self.holdoff:
+                self.lastOnset = now
+                self.onsets += 1
+                if self.onOnset is not None:
+                    self.onOnset()
+                return True
+        return False
+
+
+class IdleState:
+    """Idle state machine for long silences.
+
+    The process side reports on every tick whether anything is still shown or
+    heard (`update`). After `delay` seconds of silence the radar goes idle: the
+    caller lowers its refresh rate and stops repainting. While idle, the audio
+    callback checks every block (`process`) and calls `onWake` on the first
+    non-silent one, so the radar wakes up right away.
+    """
+    def __init__(self, delay=5.0, onWake=None):
+        self.delay = delay
+        self.onWake = onWake
+        self.idle = False
+        self.waking = False
+        self.lastActive = None
+        self.wakeups = 0
+
+    def update(self, active, now=None):
+        """Update the state after a tick, return True when it changed"""
+        if now is None:
+            now = time.perf_counter()
+        self.waking = False # at most one wake-up per tick
+        if active or self.lastActive is None:
+            self.lastActive = now
+        if active and self.idle:
+            self.idle = False
+            return True
+        if not active and not self.idle and now - self.lastActive >= self.delay:
+            self.idle = True
+            return True
+        return False
+
+    def process(self, block):
+        """Called from the audio callback: wake up on a block above minThreshold"""
+        if self.idle and not self.waking and len(block) and block.max() > minThreshold * maxSoundValue:
+            self.waking = True
+            self.wakeups += 1
+            if stats is not None:
+                stats.count('idle wakeups')
+            if self.onWake is not None:
+                self.onWake()
+
+
+class DeviceAggregator:
+    """Several input devices presented as one virtual multichannel device.
+
+    Every other device writes its blocks into its own preallocated ring buffer
+    (`callback`). The main device is the clock: for each of its blocks,
+    `assemble` reads the matching frames of every other ring and appends them
+    to the block. The read position of each device is kept one device block
+    behind its write head (so the alignment adds at most one block of latency)
+    by a delay-locked loop: the error on that distance corrects the position
+    (driftGain) and is integrated (driftTracking) into the number of device
+    frames per main frame, i.e. the samplerate ratio including the clock drift.
+    The frames are resampled to the main block by linear interpolation.
+    """
+    def __init__(self, main_info, infos):
+        self.samplerate = main_info['default_samplerate']
+        self.channels = [main_info['max_input_channels']] + [info['max_input_channels'] for info in infos]
+        self.offsets = np.cumsum([0] + self.channels)
+        self.n_chans = int(self.offsets[-1])
+        self.rings = [RingBuffer(max(int(info['default_samplerate'] * ringSeconds), maxBlocksize),
+                                 info['max_input_channels'], np.float64) for info in infos]
+        self.ratio = np.array([info['default_samplerate'] / self.samplerate for info in infos]) # device frames per main frame
+        self.nominal = self.ratio.copy()
+        self.average = self.ratio.copy() # ratio averaged over ~1000 blocks (the block jitter makes it ripple)
+        self.pos = [None] * len(infos) # read position of each ring (fractional frames)
+        self.blocks = np.zeros(len(infos)) # last blocksize of each device
+        self._out = np.zeros((0, self.n_chans))
+        self._ramp = np.zeros(0)
+
+    @property
+    def drift(self):
+        """Estimated clock drift of every other device, relative to the main one"""
+        return self.average / self.nominal - 1
+
+    def callback(self, index):
+        """Audio callback of the other device `index`"""
+        ring = self.rings[index]
+
+        def device_callback(indata, frames, time, status):
+            global overflows
+            if status and status.input_overflow:
+                overflows += 1
+            self.blocks[index] = frames
+            ring.write(indata)
+        return device_callback
+
+    def assemble(self, block):
+        """Return the block of the main device followed by the aligned channels of the other ones"""
+        n = len(block)
+        if n > len(self._out):
+            self._out = np.zeros((n, self.n_chans))
+            self._ramp = np.arange(n, dtype=np.float64)
+        out = self._out[:n]
+        out[:, :self.channels[0]] = block
+        for i, ring in enumerate(self.rings):
+            cols = slice(self.offsets[i + 1], self.offsets[i + 2])
+            written = ring.written
+            if written == 0:
+                out[:, cols] = 0
+                continue
+            if self.pos[i] is None:
+                # first data of the device: start one block behind its write head
+                self.pos[i] = written - self.blocks[i] - n * self.ratio[i]
+            self.pos[i] = max(self.pos[i], written - ring.capacity + 1.) # the device got too far ahead
+            # read n * ratio frames, corrected to keep one device block between the read and write positions
+            error = written - self.pos[i] - n * self.ratio[i] - self.blocks[i]
+            self.ratio[i] += driftTracking * error / n
+            self.average[i] += 1e-3 * (self.ratio[i] - self.average[i])
+            step = max(0., min(n * self.ratio[i] + driftGain * error, written - 1 - self.pos[i]))
+            positions = self.pos[i] + self._ramp[:n] * (step / n)
+            first = np.floor(positions)
+            frac = (positions - first)[:, None]
+            first = first.astype(np.int64)
+            a = ring.buffer[first % ring.capacity]
+            b = ring.buffer[(first + 1) % ring.capacity]
+            out[:, cols] = a + (b - a) * frac
+            self.pos[i] += step
+        return out
+
+
+class Filterbank:
+    """Band-weighted multichannel filter applied to whole blocks in the capture path.
+
+    Every band (low Hz, high Hz, weight) of `bands` is combined into one linear
+    phase FIR response, so footsteps, gunshots or voices can be favored over
+    music and ambient noise. Where bands overlap, the largest weight applies,
+    so the bands should split the spectrum for each weight to take effect.
+    Blocks are filtered by overlap-save: one rfft/irfft of all the channels at
+    once, with the last taps-1 input frames kept as state between blocks. The
+    delay is (taps-1)/2 frames.
+    """
+    def __init__(self, n_chans, samplerate, bands, taps=511):
+        self.n_chans = n_chans
+        self.taps = taps
+        # frequency sampling of the band response, windowed to `taps` coefficients
+        nfft = 8 * taps
+        freqs = np.fft.rfftfreq(nfft, 1. / samplerate)
+        response = np.zeros(len(freqs))
+        for low, high, weight in bands.values():
+            np.maximum(response, np.where((freqs >= low) & (freqs <= high), weight, 0.), out=response)
+        kernel = np.roll(np.fft.irfft(response, nfft), taps // 2)[:taps]
+        self.kernel = kernel * np.hanning(taps)
+        self.history = np.zeros((taps - 1, n_chans)) # last input frames of the previous block
+        self.spectra = {} # kernel spectrum per FFT size
+        self._input = np.zeros((0, n_chans))
+
+    def process(self, block):
+        """Return the filtered block (float64, same shape)"""
+        frames = len(block)
+        n = self.taps - 1 + frames
+        if n > len(self._input):
+            self._input = np.zeros((n, self.n_chans))
+        x = self._input[:n]
+        x[:self.taps - 1] = self.history
+        x[self.taps - 1:] = block
+        size = 1 << (n - 1).bit_length()
+        spectrum = self.spectra.get(size)
+        if spectrum is None:
+            spectrum = self.spectra[size] = np.fft.rfft(self.kernel, size)[:, None]
+        y = np.fft.irfft(np.fft.rfft(x, size, axis=0) * spectrum, size, axis=0)[self.taps - 1:n]
+        self.history[:] = x[frames:]
+        return y
+
+
+class Instrumentation:
+    """Per-stage timings and counters of the radar.
+
+    The last `window` samples of each stage (in seconds) are kept in a
+    preallocated ring, from which the p50/p95/p99 are computed on demand.
+    Stages: drain (getMaxSound), sectors (filter + sector engine), brush
+    (updateSectors), paint, and latency (from the ADC time of the newest audio
+    block to the end of the tick / paint).
+    """
+    STAGES = ('drain', 'sectors', 'brush', 'paint', 'tick latency', 'paint latency')
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.samples = {name: np.zeros(window) for name in self.STAGES}
+        self.filled = {name: 0 for name in self.STAGES}
+        self.counters = {'audio blocks': 0, 'overflows': 0, 'ticks': 0, 'missed ticks': 0, 'repaints': 0, 'idle wakeups': 0}
+        self.lastBlock = 0. # perf_counter time of the newest audio block
+        self.adcLatency = 0. # ADC to callback latency reported by PortAudio
+        self.tickBlock = None # lastBlock seen by the last tick, until it is painted
+
+    def add(self, name, value):
+        self.samples[name][self.filled[name] % self.window] = value
+        self.filled[name] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def audioBlock(self, timeinfo, status):
+        """Called from the audio callback"""
+        self.lastBlock = time.perf_counter()
+        self.counters['audio blocks'] += 1
+        if status and status.input_overflow:
+            self.counters['overflows'] += 1
+        if timeinfo is not None:
+            self.adcLatency = max(0., timeinfo.currentTime - timeinfo.inputBufferAdcTime)
+
+    def tick(self, t0, t1, t2, t3):
+        """Timestamps of a tick: start, after drain, after sectors, after brush"""
+        self.counters['ticks'] += 1
+        self.add('drain', t1 - t0)
+        self.add('sectors', t2 - t1)
+        self.add('brush', t3 - t2)
+        if self.lastBlock:
+            self.add('tick latency', t3 - self.lastBlock + self.adcLatency)
+            self.tickBlock = self.lastBlock
+
+    def painted(self, t0, t1):
+        self.counters['repaints'] += 1
+        self.add('paint', t1 - t0)
+        if self.tickBlock is not None:
+            self.add('paint latency', t1 - self.tickBlock + self.adcLatency)
+            self.tickBlock = None
+
+    def percentiles(self, name):
+        n = min(self.filled[name], self.window)
+        if n == 0:
+            return None
+        return np.percentile(self.samples[name][:n], [50, 95, 99])
+
+    def summary(self):
+        stages = {}
+        for name in self.STAGES:
+            p = self.percentiles(name)
+            if p is not None:
+                stages[name] = {'p50_ms': p[0] * 1000, 'p95_ms': p[1] * 1000, 'p99_ms': p[2] * 1000,
+                                'samples': self.filled[name]}
+        return {'stages': stages, 'counters': dict(self.counters)}
+
+    def hudLines(self):
+        lines = []
+        for name in ('sectors', 'paint', 'tick latency', 'paint latency'):
+            p = self.percentiles(name)
+            if p is not None:
+                lines.append(f"{name:<14}{p[0] * 1000:6.2f}{p[1] * 1000:7.2f}{p[2] * 1000:7.2f} ms")
+        c = self.counters
+        lines.append(f"overflows {c['overflows']}  missed {c['missed ticks']}  repaints {c['repaints']}")
+        return lines
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        print(f"stats written to {path}", file=sys.stderr)
+
+
+def audio_callback(indata, frames, time, status):
+    """This is called (from a separate thread) for each audio block.
+    Shape of outdata is (frames, channels)"""
+    global overflows
+    if status:
+        print(status, file=sys.stderr)
+        if status.input_overflow:
+            overflows += 1
+    if stats is not None:
+        stats.audioBlock(time, status)
+    if aggregator is not None:
+        # append the aligned channels of the other devices
+        indata = aggregator.assemble(indata)
+    if filterbank is not None:
+        indata = filterbank.process(indata)
+    # copy into the preallocated ring buffer, or reduce in place (no allocation in the audio thread)
+    capture.write(indata)
+    if onsetDetector is not None:
+        onsetDetector.process(indata)
+    if idleState is not None:
+        idleState.process(indata)
+
+def getMaxSound(n_chans):
+    """This is called by process to update values for each channel
+
+    Typically, audio callbacks happen more frequently than plot updates,
+    therefore the ring buffer tends to contain multiple blocks of audio data.
+    The max is taken over all of them so short transients are not missed.
+    With reductionMode, the callback already did the reduction and this only
+    swaps the accumulators (and returns the RMS instead of the peak with
+    reductionRms).
+    """
+    maxVals = np.zeros(n_chans)
+    peak = capture.readMax()
+    if peak is not None and reductionMode and reductionRms:
+        peak = capture.rms # RMS level of the blocks instead of their peak
+    if peak is not None:
+        np.maximum(maxVals, peak, out=maxVals)
+    return maxVals/maxSoundValue # return sound in percentage
+
+# transfer curves on [0, 1]: name -> f(x, **params), vectorized
+CURVES = {
+    'linear': lambda x: x,
+    'exp': lambda x, k=5.: 1 - np.exp(-k * x), # fast rise, saturating
+    'power': lambda x, gamma=1.: x ** gamma, # gamma < 1 enhances small values, > 1 reduces them
+    'smoothstep': lambda x: x * x * (3 - 2 * x),
+}
+
+
+class Curve:
+    """Transfer curve sampled in a lookup table of lutSize points on [0, 1].
+
+    `shape` is a name of CURVES or any vectorized function of (x, **params).
+    Calling the curve interpolates the table (inputs are clipped to [0, 1]).
+    The table is only rebuilt by `set` when the shape or the parameters change.
+    """
+    def __init__(self, shape, **params):
+        self.shape = None
+        self.params = None
+        self.rebuilds = 0
+        self.set(shape, **params)
+
+    def set(self, shape, **params):
+        if shape == self.shape and params == self.params and len(self.table) == lutSize:
+            return
+        function = CURVES[shape] if isinstance(shape, str) else shape
+        self.grid = np.linspace(0., 1., lutSize)
+        self.table = np.asarray(function(self.grid, **params), dtype=float)
+        self.shape, self.params = shape, params
+        self.rebuilds += 1
+
+    def __call__(self, x):
+        return np.interp(x, self.grid, self.table)
+
+
+def updateCurves():
+    """Rebuild the curves whose settings changed (inputCurve, enhanceCurve, strengthCurve)"""
+    for curve, (shape, params) in ((inputLut, inputCurve), (enhanceLut, enhanceCurve), (strengthLut, strengthCurve)):
+        curve.set(shape, **params)
+
+def enhancer(x):
+    # works on scalars as well as on arrays of sector values
+    x = np.asarray(x, dtype=float)
+    # Apply a smooth curve instead of binary 0/1
+    # This preserves intermediate values for yellow color range
+    normalized = np.maximum(x - minThreshold, 0) / (1.0 - minThreshold)
+    # Apply the enhancement curve (a power curve enhances larger values while keeping gradual transition)
+    return np.where(x < minThreshold, 0., enhanceLut(normalized))
+
+def sectorStrengths(values, global_peak):
+    """Strengths (0~1) displayed for all the sectors according to STRENGTH_MODE
+
+    Returns the strengths and the updated global peak (used by mode 1)."""
+    raw = np.clip(values, 0., 1.)
+    # according to the strength mode, set the processing method
+    if STRENGTH_MODE == 1:
+        # mode 1: only emphasize the strongest direction among all
+        # track the recent global peak (slowly decreasing): peak = max(peak * 0.9, raw, 1e-3) from
+        # one sector to the next, unrolled as a running max of the raw values decayed by 0.9 per sector
+        decay = 0.9 ** np.arange(len(raw))
+        peaks = np.maximum(np.maximum.accumulate(np.maximum(raw, 1e-3) / decay) * decay, global_peak * 0.9 * decay)
+        ratio = raw / (peaks + 1e-6)
+        # only keep the values around the largest value (0.6 or higher) and 0 for the rest: 0.6→0, 1.0→1
+        strength = (ratio - 0.6) / 0.4
+        global_peak = float(peaks[-1]) if len(peaks) else global_peak
+    else:
+        # mode 2: show multiple directions, but the strongest direction is much more prominent
+        # (the default curve squares the values to make smaller values smaller and larger values stay the same)
+        strength = strengthLut(raw)
+    return np.clip(strength, 0., 1.), global_peak
+
+def initfilter(x, t):
+    # threshold and input curve on all the channels at once
+    return np.where(x < t, 0., inputLut(x))
+
+# Exponential fade effect
+def apply_fade(current_value, elapsed_time, decay_rate=2.0):
+    """Apply exponential decay fade - natural fade out"""
+    return current_value * np.exp(-decay_rate * elapsed_time)
+
+def layoutProjection(azimuths, n_sectors, sharpness=0.):
+    """Sector projection matrix (n_sectors x channels) of a speaker layout.
+
+    `azimuths` gives the azimuth of every channel in degrees, clockwise from
+    the front (None for a channel without direction). Each sector, centered
+    on pos * 360 / n_sectors, is interpolated between the two speakers around
+    it; `sharpness` subtracts that much of the mean of the directional channels
+    so that a sound heard on every speaker does not light the whole radar.
+    """
+    speakers = sorted((az % 360, chan) for chan, az in enumerate(azimuths) if az is not None)
+    if not speakers:
+        raise ValueError("the speaker layout has no directional channel")
+    angles = np.array([az for az, _ in speakers])
+    projection = np.zeros((n_sectors, len(azimuths)))
+    for pos in range(n_sectors):
+        phi = pos * 360. / n_sectors
+        i = np.searchsorted(angles, phi, side='right') - 1 # speaker before phi (-1 wraps to the last one)
+        j = (i + 1) % len(speakers)
+        span = (angles[j] - angles[i]) % 360 or 360.
+        t = ((phi - angles[i]) % 360) / span
+        projection[pos, speakers[i][1]] += 1 - t
+        projection[pos, speakers[j][1]] += t
+    directional = sorted({chan for _, chan in speakers})
+    projection[:, directional] -= sharpness / len(directional)
+    return projection
+
+
+def layoutAzimuths(n_chans):
+    """Channel azimuths of the speaker layout of a device with n_chans channels.
+
+    Without speakerLayout, the layout with that many channels is used (a 6
+    channels device is 5.1, not the first channels of 7.1), 7.1 otherwise.
+    """
+    if speakerLayout is not None:
+        return LAYOUTS[speakerLayout]
+    for name in ('stereo', '5.1', '7.1', '7.1.4'):
+        if len(LAYOUTS[name]) == n_chans:
+            return LAYOUTS[name]
+    return LAYOUTS['7.1']
+
+
+class SectorEngine:
+    """Batched update of all the radar sectors.
+
+    The sector values are a projection of the channel values: one matrix
+    multiply per tick, whatever the number of channels and sectors. The
+    matrix is built once, either from the sector table (each row a 'sum',
+    'diff' or 'single' combination of the `mapping` channels) or from a
+    speaker layout (see fromLayout). The previous max values, update
+    timestamps and first-update flags are kept as arrays so that every
+    sector is computed in one vectorized pass with a single clock read.
+    """
+    def __init__(self, table, mapping, prevmax=None):
+        n = len(table)
+        projection = np.zeros((n, max(mapping.values()) + 1))
+        chanA = np.zeros(n, dtype=int)
+        chanB = np.zeros(n, dtype=int)
+        ratioGate = np.zeros(n, dtype=bool)
+        for pos, (mode, a, b, gate) in enumerate(table):
+            chanA[pos] = mapping[a]
+            chanB[pos] = mapping[b if b is not None else a]
+            if mode == 'sum':
+                # mean of both channels
+                weightA, weightB = 0.5, 0.5
+            elif mode == 'diff':
+                weightA, weightB = 1., -1.
+            elif mode == 'single':
+                weightA, weightB = 1., 0.
+            else:
+                raise ValueError(f"unknown sector mode: {mode}")
+            projection[pos, chanA[pos]] += weightA
+            projection[pos, chanB[pos]] += weightB
+            ratioGate[pos] = gate
+        self.setProjection(projection, prevmax, (chanA, chanB, ratioGate))
+
+    @classmethod
+    def fromLayout(cls, azimuths, n_sectors, sharpness=0., prevmax=None):
+        """Engine of a speaker layout (channel azimuths, see layoutProjection)"""
+        engine = cls.__new__(cls)
+        engine.setProjection(layoutProjection(azimuths, n_sectors, sharpness), prevmax)
+        return engine
+
+    def setProjection(self, projection, prevmax=None, gate=None):
+        n = len(projection)
+        self.projection = projection
+        self.prevmax = np.zeros(n) if prevmax is None else prevmax
+        if len(self.prevmax) != n:
+            raise ValueError(f"prevmax has {len(self.prevmax)} values for {n} sectors")
+        self.tupdate = np.zeros(n)
+        self.fistFlag = np.zeros(n, dtype=bool)
+        # ratio gate of the table sectors: (channel a, channel b, gated)
+        self.gate = gate if gate is not None and gate[2].any() else None
+
+    def checkChannels(self, n_chans):
+        """Raise a ValueError if the projection needs more channels than n_chans"""
+        needed = self.projection.shape[1]
+        if n_chans < needed:
+            layout = 'the sector table' if speakerLayout is None else f"the {speakerLayout} layout"
+            raise ValueError(f"{layout} needs {needed} channels, the input has {n_chans}"
+                             " (set speakerLayout to a layout of the device)")
+
+    def reset(self):
+        self.prevmax[:] = 0
+        self.tupdate[:] = 0
+        self.fistFlag[:] = False
+
+    def update(self, maxValues, now=None):
+        """Update prevmax from the filtered channel values (in percentage)"""
+        if now is None:
+            now = time.time()
+        values = self.projection @ maxValues[:self.projection.shape[1]]
+        rising = values > self.prevmax
+        if self.gate is not None:
+            # gated sectors are only valid if a is larger than b of at least maxdifmain percents
+            chanA, chanB, ratioGate = self.gate
+            rising &= ~ratioGate | (values > maxdifmain * np.minimum(maxValues[chanA], maxValues[chanB]))
+        elapsed = now - self.tupdate
+        firstFade = ~rising & self.fistFlag & (elapsed > minTFU)
+        fade = firstFade | (~rising & ~self.fistFlag & (elapsed > minTBU))
+        # higher than previous max : new value - if not valid : reduce prevmax
+        self.prevmax[:] = np.where(rising, enhancer(values),
+                                   np.where(fade, apply_fade(self.prevmax, elapsed, fade_decay_rate), self.prevmax))
+        self.prevmax[self.prevmax < 0.01] = 0
+        self.tupdate[rising | fade] = now
+        self.fistFlag[rising] = True
+        self.fistFlag[firstFade] = False
+        return self.prevmax
+
+
+class DoaEstimator:
+    """Continuous direction of arrival from a short window of all the channels.
+
+    The window of every directional channel goes through one batched rfft per
+    tick (fixed length, so NumPy reuses its FFT plan, and a cached Hann window).
+    The level gives the energy vector of the speaker azimuths, whose length is
+    the confidence (1 = all the energy from one direction, 0 = diffuse). The
+    phase tells whether the two loudest channels carry the same sound (a source
+    panned between them, where the energy vector is right) or two unrelated
+    ones, in which case the bearing is pulled to the loudest channel.
+    """
+    def __init__(self, azimuths, n_chans, samplerate, window=1024, band=(100., 8000.)):
+        chans = [chan for chan, az in enumerate(azimuths[:n_chans]) if az is not None]
+        if len(chans) < 2:
+            raise ValueError("the DOA needs at least 2 channels with an azimuth")
+        self.chans = np.array(chans)
+        az = np.radians([azimuths[chan] for chan in chans])
+        self.units = np.stack([np.sin(az), np.cos(az)], axis=1) # x = right, y = front
+        self.frames = np.zeros((window, n_chans)) # last window of the capture (every channel)
+        self.window = np.hanning(window)[:, None]
+        freqs = np.fft.rfftfreq(window, 1. / samplerate)
+        self.band = slice(np.searchsorted(freqs, band[0]), np.searchsorted(freqs, band[1], side='right'))
+        self.azimuth = 0.
+        self.confidence = 0.
+
+    def estimate(self, frames=None):
+        """Return (azimuth in degrees clockwise from the front, confidence 0~1) of the window"""
+        if frames is None:
+            frames = self.frames
+        spectra = np.fft.rfft(frames[:, self.chans] * self.window, axis=0)[self.band]
+        energy = (spectra.real ** 2 + spectra.imag ** 2).sum(axis=0)
+        total = energy.sum()
+        if total <= 0:
+            self.confidence = 0.
+            return self.azimuth, self.confidence
+        vector = energy @ self.units
+        length = math.hypot(vector[0], vector[1])
+        # coherence of the two loudest channels
+        order = np.argsort(energy)
+        a, b = order[-1], order[-2]
+        if energy[b] > 0:
+            coherence = abs(np.vdot(spectra[:, b], spectra[:, a])) ** 2 / (energy[a] * energy[b])
+        else:
+            coherence = 0.
+        direction = (1 - coherence) * self.units[a]
+        if length > 0:
+            direction = direction + coherence * vector / length
+        self.azimuth = math.degrees(math.atan2(direction[0], direction[1]))
+        self.confidence = length / total
+        return self.azimuth, self.confidence
+
+
+def updateRadar(radarObject):
+    """Process the audio received since the last tick and update the radar.
+
+    Returns False when nothing is heard nor shown anymore (see IdleState).
+    """
+    t0 = time.perf_counter()
+    maxValues = getMaxSound(n_channel)
+    t1 = time.perf_counter()
+    peaks = maxValues # raw peaks for the recorder
+    maxValues = initfilter(maxValues, minThreshold)
+    # update every part of the "radar" in one batched pass
+    sectorEngine.update(maxValues)
+    t2 = time.perf_counter()
+    radarObject.updateSectors(prevmax)
+    if recorder is not None:
+        recorder.record(peaks, prevmax)
+    if publisher is not None:
+        publisher.publish(prevmax)
+    active = bool(maxValues.any() or prevmax.any())
+    if doaEstimator is not None:
+        if active and capture.latest(doaEstimator.frames):
+            radarObject.setBearing(*doaEstimator.estimate())
+        else:
+            radarObject.setBearing(0., 0.) # hide the needle
+    if stats is not None:
+        stats.tick(t0, t1, t2, time.perf_counter())
+    if DEBUG:
+        # printed after the timings, so they do not measure stdout
+        print(maxValues*100) # this will generate a lot of output. Could be improved by updating the line instead of printing a new line :o)
+        print(prevmax)
+        print('----')
+    return active
+
+
+
+
+
+def openStream(device_id, device_info, extra=()):
+    """Set up the capture for the device and return its (not started) input stream.
+
+    The channels of the `extra` devices ((device_id, device_info) pairs) are
+    appended after the ones of the main device (see DeviceAggregator).
+    """
+    global n_chans, n_channel, capture, maxSoundValue, doaEstimator, filterbank, aggregator
+    # Update channel count based on actual device
+    n_chans = device_info['max_input_channels']
+    aggregator = DeviceAggregator(device_info, [info for _, info in extra]) if extra else None
+    if aggregator is not None:
+        n_chans = aggregator.n_chans
+    n_channel = n_chans
+    sectorEngine.checkChannels(n_chans)
+    maxSoundValue = fullScale(streamDtype) # normalization follows the stream format
+    updateCurves()
+    filterbank = Filterbank(n_chans, device_info['default_samplerate'], filterBands, filterTaps) if bandFiltering else None
+    if reductionMode:
+        capture = BlockReducer(n_chans, reductionRms)
+    else:
+        # the filtered or resampled blocks are kept as float (the filter can slightly overshoot the full scale)
+        capture = RingBuffer(max(int(device_info['default_samplerate'] * ringSeconds), maxBlocksize), n_chans,
+                             np.float32 if bandFiltering or aggregator is not None else streamDtype)
+        if doaEstimation:
+            # the window holds every channel of the capture, the aggregated ones have no azimuth
+            doaEstimator = DoaEstimator(layoutAzimuths(device_info['max_input_channels']), capture.buffer.shape[1],
+                                        device_info['default_samplerate'], doaWindow, doaBand)
+    devices = [(device_id, device_info, audio_callback)]
+    devices += [(extra_id, extra_info, aggregator.callback(i)) for i, (extra_id, extra_info) in enumerate(extra)]
+    return AdaptiveStream(devices)
+
+
+class AdaptiveStream:
+    """Input streams opened with the stream settings (dtype, blocksize, latency).
+
+    One stream per (device_id, device_info, callback) of `devices`, the first
+    one being the main device. With adaptiveBlocksize, `adapt` doubles the
+    blocksize (up to maxBlocksize) and reopens the streams when the callbacks
+    reported at least overflowLimit overflows since the last check, trading
+    latency for robustness.
+    """
+    def __init__(self, devices):
+        self.devices = devices
+        self.blocksize = streamBlocksize
+        self.streams = None
+        self.lastCheck = time.perf_counter()
+        self.lastOverflows = overflows
+
+    def open(self):
+        import sounddevice as sd
+        self.streams = [sd.InputStream(dtype=streamDtype, blocksize=self.blocksize, latency=streamLatency,
+                                       device=device_id, channels=device_info['max_input_channels'],
+                                       samplerate=device_info['default_samplerate'], callback=callback)
+                        for device_id, device_info, callback in self.devices]
+        # start the other devices first, so their data is there for the first block of the main one
+        for stream in self.streams[::-1]:
+            stream.start()
+
+    def close(self):
+        for stream in self.streams:
+            stream.stop()
+            stream.close()
+        self.streams = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def adapt(self):
+        """Check the overflows (at most once per overflowInterval), grow the blocksize if needed"""
+        now = time.perf_counter()
+        if now - self.lastCheck < overflowInterval:
+            return
+        count = overflows - self.lastOverflows
+        self.lastCheck = now
+        self.lastOverflows = overflows
+        if not adaptiveBlocksize or count < overflowLimit or self.blocksize >= maxBlocksize or self.streams is None:
+            return
+        self.blocksize = min(max(2 * self.blocksize, 256), maxBlocksize)
+        print(f"{count} overflows, blocksize increased to {self.blocksize}", file=sys.stderr)
+        self.close()
+        self.open()
+        self.lastOverflows = overflows
+
+
+class SectorSnapshot:
+    """Latest sector values shared between the DSP process and the GUI.
+
+    The shared memory block holds a sequence number followed by the time, the
+    idle flag of the DSP loop and the sector values. The sequence number is odd
+    while the writer is updating the values, so the reader retries until it
+    gets a consistent copy (seqlock). `idle` is the flag of the last read.
+    """
+    def __init__(self, n_sectors, name=None):
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=8 * (n_sectors + 3))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.seq = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((n_sectors + 2,), dtype=np.float64, buffer=self.shm.buf, offset=8)
+        if self.owner:
+            self.seq[0] = 0
+        self.lastSeq = 0
+        self.idle = False
+
+    def publish(self, values, now, idle=False):
+        self.seq[0] += 1
+        self.data[0] = now
+        self.data[1] = idle
+        self.data[2:] = values
+        self.seq[0] += 1
+
+    def read(self, out):
+        """Copy the latest values in out, return their time (None if they did not change)"""
+        while True:
+            seq = self.seq[0]
+            if seq == self.lastSeq:
+                return None
+            if seq % 2:
+                time.sleep(0)
+                continue
+            now = self.data[0]
+            idle = bool(self.data[1])
+            out[:] = self.data[2:]
+            if self.seq[0] == seq:
+                self.lastSeq = seq
+                self.idle = idle
+                return now
+
+    def close(self):
+        # the numpy views must be released before closing the shared memory
+        self.seq = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+TIMELINE_HEADER = struct.Struct('<4sHHHxxd') # magic, version, channels, sectors, start time (epoch)
+
+
+class TimelineRecorder:
+    """Records what the radar showed in a compact binary file.
+
+    After a small header (TIMELINE_HEADER), every tick is one fixed-size float32
+    record: time since the start, the peak of every channel (getMaxSound) and
+    the value of every sector (prevmax). Records are copied into preallocated
+    chunks and the full chunks are written by a background thread, so the
+    caller never waits on the disk.
+    """
+    def __init__(self, path, n_chans, n_sectors, chunk=256, start=None):
+        self.path = path
+        self.n_chans = n_chans
+        self.n_sectors = n_sectors
+        self.start = time.time() if start is None else start
+        self.file = open(path, 'wb')
+        self.file.write(TIMELINE_HEADER.pack(b'SRTL', 1, n_chans, n_sectors, self.start))
+        self.free = queue.Queue()
+        for _ in range(3):
+            self.free.put(np.zeros((chunk, 1 + n_chans + n_sectors), dtype=np.float32))
+        self.pending = queue.Queue()
+        self.chunk = self.free.get()
+        self.rows = 0
+        self.records = 0
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.writer.start()
+
+    def record(self, peaks, values, now=None):
+        row = self.chunk[self.rows]
+        row[0] = (time.time() if now is None else now) - self.start
+        row[1:1 + self.n_chans] = peaks[:self.n_chans]
+        row[1 + self.n_chans:] = values
+        self.rows += 1
+        self.records += 1
+        if self.rows == len(self.chunk):
+            self.pending.put((self.chunk, self.rows))
+            self.chunk = self.free.get() # only waits if the disk is 2 chunks late
+            self.rows = 0
+
+    def _write(self):
+        while True:
+            chunk, rows = self.pending.get()
+            if chunk is None:
+                break
+            self.file.write(chunk[:rows].tobytes())
+            self.free.put(chunk)
+        self.file.close()
+
+    def close(self):
+        if self.rows:
+            self.pending.put((self.chunk, self.rows))
+        self.pending.put((None, 0))
+        self.writer.join()
+
+
+class Timeline:
+    """Memory-mapped read access to a file of TimelineRecorder (no parsing)"""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, self.n_chans, self.n_sectors, self.start = TIMELINE_HEADER.unpack(f.read(TIMELINE_HEADER.size))
+        if magic != b'SRTL' or version != 1:
+            raise ValueError(f"{path} is not a radar timeline")
+        columns = 1 + self.n_chans + self.n_sectors
+        size = os.path.getsize(path) - TIMELINE_HEADER.size
+        self.records = np.memmap(path, dtype=np.float32, mode='r', offset=TIMELINE_HEADER.size,
+                                 shape=(size // (4 * columns), columns)) if size >= 4 * columns else np.zeros((0, columns), np.float32)
+        self.time = self.records[:, 0]
+        self.peaks = self.records[:, 1:1 + self.n_chans]
+        self.values = self.records[:, 1 + self.n_chans:]
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        return float(self.time[-1]) if len(self) else 0.
+
+    def index(self, t):
+        """Index of the last record at or before t (seconds since the start)"""
+        return max(0, int(np.searchsorted(self.time, t, side='right')) - 1)
+
+
+def dspMain(shmName, device_id, device_info, stop, extra=(), wakeSocket=None):
+    """Capture and sector engine of the DSP process (dspProcess mode).
+
+    Publishes the sector values to the shared snapshot every refreshtime, or
+    right away on a sound onset. When idle, the loop only runs at idleRate and
+    does not publish until the next non-silent block: the snapshot only tells
+    the GUI once that it went idle, so the GUI can poll it slowly as well, and
+    a byte is sent on `wakeSocket` when the loop wakes up so the GUI reads the
+    snapshot right away.
+    """
+    global onsetDetector, idleState, recorder
+    snapshot = SectorSnapshot(len(prevmax), shmName)
+    stream = openStream(device_id, device_info, extra)
+    wake = threading.Event()
+    onsetDetector = None
+    if onsetDetection:
+        # wake the loop from the audio thread
+        onsetDetector = OnsetDetector(n_chans, onsetRatio, onsetFloor, onsetAverage, onsetHoldoff, wake.set)
+    idleState = IdleState(idleDelay, wake.set) if idleMode else None
+    recorder = openRecorder()
+    try:
+        with stream:
+            deadline = time.perf_counter()
+            while not stop.is_set():
+                period = 1. / idleRate if idleState is not None and idleState.idle else refreshtime
+                deadline += period
+                wake.wait(max(0., deadline - time.perf_counter()))
+                if wake.is_set():
+                    wake.clear()
+                    deadline -= period # onset update, keep the regular grid
+                elif time.perf_counter() - deadline > period:
+                    deadline = time.perf_counter() # too late, skip the missed ticks
+                peaks = getMaxSound(n_channel)
+                maxValues = initfilter(peaks, minThreshold)
+                sectorEngine.update(maxValues)
+                if recorder is not None:
+                    recorder.record(peaks, prevmax)
+                changed = idleState is not None and idleState.update(bool(maxValues.any() or prevmax.any()))
+                if idleState is None or not idleState.idle or changed:
+                    snapshot.publish(prevmax, time.time(), idleState is not None and idleState.idle)
+                if changed and not idleState.idle and wakeSocket is not None:
+                    try:
+                        wakeSocket.send(b'w')
+                    except OSError:
+                        pass # the GUI is gone
+                stream.adapt()
+    finally:
+        snapshot.close()
+        if recorder is not None:
+            recorder.close()
+
+
+def openRecorder():
+    """TimelineRecorder of the running radar (None without recordTimeline)"""
+    if not recordTimeline:
+        return None
+    path = time.strftime(timelineFile)
+    print(f"Recording the radar timeline to {path}")
+    return TimelineRecorder(path, n_channel, len(prevmax))
+
+
+def updateFromSnapshot(radarObject, snapshot):
+    """GUI side of the dspProcess mode: show the latest values published by the DSP process"""
+    now = snapshot.read(prevmax)
+    if now is None:
+        return
+    if publisher is not None:
+        publisher.publish(prevmax, now)
+    radarObject.updateSectors(prevmax)
+    if stats is not None:
+        stats.count('ticks')
+
+
+class AudioFile:
+    """Multichannel recording read in chunks (WAV, .npy or raw interleaved samples).
+
+    Samples are memory-mapped, so hours of audio can be replayed without
+    loading them in memory. 24 bits WAV samples are converted to int32.
+    """
+    def __init__(self, path, n_chans=None, samplerate=None, dtype='int32'):
+        self.samplerate = samplerate
+        self.packed24 = False
+        if path.lower().endswith('.wav'):
+            self._openWav(path)
+        elif path.lower().endswith('.npy'):
+            self.data = np.load(path, mmap_mode='r')
+            if self.data.ndim == 1:
+                self.data = self.data.reshape(-1, 1)
+        else:
+            if n_chans is None:
+                raise ValueError("the number of channels is needed for raw files")
+            self.data = np.memmap(path, dtype=dtype, mode='r')
+            self.data = self.data[:len(self.data) // n_chans * n_chans].reshape(-1, n_chans)
+        if self.samplerate is None:
+            raise ValueError("the samplerate is needed for raw and .npy files")
+        self.frames, self.n_chans = self.data.shape[:2]
+        if self.packed24:
+            self.maxValue = 2. ** 32 / 2
+        else:
+            self.maxValue = fullScale(self.data.dtype)
+
+    def _openWav(self, path):
+        with open(path, 'rb') as f:
+            riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave != b'WAVE':
+                raise ValueError(f"not a WAV file: {path}")
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"no data chunk in {path}")
+                chunk, size = struct.unpack('<4sI', header)
+                if chunk == b'fmt ':
+                    body = f.read(size + size % 2)
+                    tag, n_chans, samplerate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                    if tag == 0xFFFE: # WAVE_FORMAT_EXTENSIBLE: the format is in the sub format GUID
+                        tag = struct.unpack('<H', body[24:26])[0]
+                    fmt = tag, n_chans, samplerate, bits
+                elif chunk == b'data':
+                    offset = f.tell()
+                    break
+                else:
+                    f.seek(size + size % 2, 1)
+        if fmt is None:
+            raise ValueError(f"no fmt chunk in {path}")
+        tag, n_chans, samplerate, bits = fmt
+        self.samplerate = samplerate
+        if tag == 3:
+            dtype = {32: np.float32, 64: np.float64}[bits]
+        elif tag == 1 and bits == 24:
+            self.packed24 = True
+            dtype = np.uint8
+        elif tag == 1:
+            dtype = {8: np.uint8, 16: np.int16, 32: np.int32}[bits]
+        else:
+            raise ValueError(f"unsupported WAV format: {tag}")
+        width = bits // 8
+        frames = size // (width * n_chans)
+        if self.packed24:
+            self.data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(frames, n_chans, 3))
+        else:
+            self.data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(frames, n_chans))
+
+    def chunks(self, blocksize):
+        for start in range(0, self.frames, blocksize):
+            chunk = self.data[start:start + blocksize]
+            if self.packed24:
+                # put the 3 bytes in the upper part of an int32
+                padded = np.zeros(chunk.shape[:2] + (4,), dtype=np.uint8)
+                padded[..., 1:] = chunk
+                chunk = padded.view('<i4')[..., 0]
+            elif chunk.dtype == np.uint8:
+                chunk = chunk.astype(np.int16) - 128
+            yield chunk
+
+
+def fullScale(dtype):
+    """Value used to normalize samples of the given dtype (maxSoundValue)"""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return 1.
+    if dtype == np.uint8:
+        return 2. ** 8 / 2 # unsigned 8 bits samples are shifted to signed values
+    return 2. ** (8 * dtype.itemsize) / 2
+
+
+def arrayChunks(data, blocksize):
+    for start in range(0, len(data), blocksize):
+        yield data[start:start + blocksize]
+
+
+def replayAudio(chunks, samplerate, n_chans, maxValue, blocksize=512):
+    """Run the radar pipeline headless on recorded audio, as fast as possible.
+
+    The chunks go through the same capture -> getMaxSound -> initfilter ->
+    sectorEngine -> sectorStrengths path as the live radar, with a simulated
+    clock (ticks every refreshtime of audio, and on onsets if onsetDetection).
+    Returns the timeline as an array: one row per tick with the time followed
+    by the strength of each sector.
+    """
+    global capture, n_channel, maxSoundValue, filterbank
+    n_channel = n_chans
+    sectorEngine.checkChannels(n_chans)
+    maxSoundValue = maxValue
+    updateCurves()
+    capture = RingBuffer(max(int(samplerate * ringSeconds), blocksize), n_chans, np.float64)
+    filterbank = Filterbank(n_chans, samplerate, filterBands, filterTaps) if bandFiltering else None
+    detector = OnsetDetector(n_chans, onsetRatio, onsetFloor, onsetAverage, onsetHoldoff) if onsetDetection else None
+    sectorEngine.reset()
+    global_peak = 0.1
+    timeline = []
+
+    def tick(now):
+        nonlocal global_peak
+        maxValues = getMaxSound(n_channel)
+        maxValues = initfilter(maxValues, minThreshold)
+        sectorEngine.update(maxValues, now)
+        strengths, global_peak = sectorStrengths(prevmax, global_peak)
+        timeline.append(np.concatenate(([now], strengths)))
+
+    frames = 0
+    nextTick = refreshtime
+    for chunk in chunks:
+        if filterbank is not None:
+            chunk = filterbank.process(chunk)
+        capture.write(chunk)
+        frames += len(chunk)
+        now = frames / samplerate
+        onset = detector is not None and detector.process(chunk, now)
+        # the regular ticks up to now first, so the time of the timeline never goes backwards
+        while now >= nextTick:
+            tick(nextTick)
+            nextTick += refreshtime
+        if onset:
+            tick(now)
+    return np.array(timeline).reshape(-1, 1 + len(prevmax))
+
+
+# GLOBAL PARAMETERS (should be in capital... at least the title is in capital :o) )
+n_chans=8 # number of channels on sound device
+n_channel = n_chans # yup, that's badly coded :o)
+maxSoundValue = 2. ** 32 /2 # updated according to the dtype stream recording (see fullScale)
+
+STRENGTH_MODE = 2
+mapping = {}
+mapping['avg'] = 1 - 1  # avg = front left
+mapping['avd'] = 2 - 1  # avd = front right
+mapping['d'] = 8 - 1    # d = right
+mapping['g'] = 7 - 1    # g = left
+mapping['arg'] = 5 - 1  # arg = back left
+mapping['ard'] = 6 - 1  # ard = back right
+# sector table, clockwise from the front: (mode, channel a, channel b, maxdifmain gate)
+# sum = mean of a and b, diff = a - b, single = a only
+SECTOR_TABLE = [
+    ('sum', 'avg', 'avd', False),
+    ('diff', 'avd', 'avg', True),
+    ('diff', 'd', 'avd', False),
+    ('single', 'd', None, False),
+    ('diff', 'd', 'ard', False),
+    ('diff', 'ard', 'arg', True),
+    ('sum', 'arg', 'ard', False),
+    ('diff', 'arg', 'ard', True),
+    ('diff', 'g', 'arg', False),
+    ('single', 'g', None, False),
+    ('diff', 'g', 'avg', False),
+    ('diff', 'avg', 'avd', True),
+]
+# speaker layouts: azimuth of each channel in degrees, clockwise from the front
+# (None = no direction, e.g. LFE)
+LAYOUTS = {
+    'stereo': [-30, 30],                                       # L R
+    '5.1': [-30, 30, 0, None, -110, 110],                      # FL FR C LFE SL SR
+    '7.1': [-30, 30, 0, None, -150, 150, -90, 90],             # FL FR C LFE BL BR SL SR
+    '7.1.4': [-30, 30, 0, None, -150, 150, -90, 90,
+              -45, 45, -135, 135],                             # + TFL TFR TBL TBR (heights on their azimuth)
+}
+speakerLayout = None # None = the SECTOR_TABLE over mapping (7.1), or a LAYOUTS key for the generic projection
+nSectors = 12 # number of sectors with a speaker layout
+layoutSharpness = 0.5 # part of the mean of all the speakers removed from every sector (speaker layout only)
+minTFU = 0.5 # minimum Time needed for First Update (upper sound value)
+minTBU = 0.1 # minimum Time needed Between Update (lower sound value)
+maxdifmain = 0.01 # max percentage difference between main front/back channels
+maxColorRange = 255 # max value for color
+minThreshold = 0.005 # lowpass filter threshold on maxValues
+redfactor = 5 #reduction factor if no upper value recorded
+refreshRate = 10 # target refresh rate in Hz (e.g. 30/60/144)
+refreshtime = 1. / refreshRate # time between two refresh
+onsetDetection = True # update the radar right away on a sound onset instead of waiting for the next refresh
+onsetRatio = 4.0 # block energy needed, relative to the running average, to detect an onset
+onsetFloor = 1e-5 # minimum block energy (normalized) to detect an onset
+onsetAverage = 0.05 # smoothing factor of the running average (per audio block)
+onsetHoldoff = 0.03 # minimum time between two onset updates
+ringSeconds = 1.0 # seconds of audio kept in the ring buffer between two refresh
+reductionMode = False # reduce each block to per-channel peak/RMS in the audio callback instead of using the ring buffer
+reductionRms = False # with reductionMode, drive the radar by the RMS of the blocks instead of their peak (lower values)
+recordTimeline = False # record the peaks and sector values of every tick (replay with soundRadar.py --timeline FILE)
+timelineFile = 'radar_timeline_%Y%m%d_%H%M%S.srtl' # strftime pattern of the timeline file
+idleMode = True # lower the refresh rate and stop repainting during long silences
+idleDelay = 5.0 # seconds of silence (nothing heard and every sector faded out) before going idle
+idleRate = 2 # refresh rate (Hz) while idle, the first non-silent block wakes the radar right away
+aggregateDevices = [] # keywords of other input devices whose channels are appended after the main device (e.g. ['Headset'])
+driftGain = 0.05 # part of the alignment error of the other devices corrected on each block
+driftTracking = 1e-4 # part of the alignment error integrated in their clock drift estimate on each block
+bandFiltering = False # detect on the weighted filterBands instead of the broadband signal
+# detection bands: name -> (low Hz, high Hz, weight), where bands overlap the largest weight applies (keep them apart)
+filterBands = {
+    'footsteps': (80., 500., 1.0),
+    'voice': (500., 2000., 0.3),
+    'gunshots': (2000., 6000., 1.0),
+}
+filterTaps = 511 # length of the band filter (delay of (filterTaps-1)/2 frames, ~5 ms at 48 kHz)
+doaEstimation = False # show the continuous direction of arrival estimated from the last doaWindow frames (not with reductionMode)
+doaWindow = 1024 # frames of the DOA window (one batched FFT of all the channels per refresh)
+doaBand = (100., 8000.) # frequency band (Hz) used by the DOA
+doaMinConfidence = 0.3 # the bearing is hidden below this confidence
+dspProcess = False # run the capture and the sector engine in a separate process (shared memory snapshot)
+
+# Stream settings
+streamDtype = 'int32' # sample format of the stream: 'float32', 'int16' or 'int32'
+streamBlocksize = 512 # frames per audio block (0 = let PortAudio choose, variable)
+streamLatency = 'low' # 'low', 'high' or a latency in seconds
+adaptiveBlocksize = True # increase the blocksize at runtime when the audio callback reports overflows
+maxBlocksize = 4096 # upper limit of the adaptive blocksize
+overflowLimit = 3 # overflows within overflowInterval which trigger a larger blocksize
+overflowInterval = 2.0 # time between two overflow checks
+
+# Fade effect settings
+fade_decay_rate = 2.0  # Exponential decay rate (higher = faster fade out)
+
+# Response curves (name of CURVES or a function, parameters), call updateCurves() after changing them at runtime
+inputCurve = ('exp', {'k': 5.}) # channel peak above minThreshold -> channel value (initfilter)
+enhanceCurve = ('power', {'gamma': 0.7}) # sector value above minThreshold (rescaled to 0~1) -> sector max (enhancer)
+strengthCurve = ('power', {'gamma': 2.}) # sector max -> displayed strength (STRENGTH_MODE 2)
+lutSize = 1024 # points of the curve lookup tables
+inputLut = Curve(inputCurve[0], **inputCurve[1])
+enhanceLut = Curve(enhanceCurve[0], **enhanceCurve[1])
+strengthLut = Curve(strengthCurve[0], **strengthCurve[1])
+
+prevmax = np.zeros(len(SECTOR_TABLE) if speakerLayout is None else nSectors) # initialize the "previous max" value
+if speakerLayout is None:
+    sectorEngine = SectorEngine(SECTOR_TABLE, mapping, prevmax)
+else:
+    sectorEngine = SectorEngine.fromLayout(LAYOUTS[speakerLayout], nSectors, layoutSharpness, prevmax)
+
+DEBUG = False # print the channel and sector values on every tick (slow, for debugging only)
+INSTRUMENTATION = True # per-stage timings and counters (dumped to statsFile on SIGUSR1 / Ctrl+Break)
+statsFile = 'radar_stats.json'
+statsOnExit = False # also dump the stats to statsFile when the radar is closed
+stats = Instrumentation() if INSTRUMENTATION else None
+deviceCacheFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'soundRadar_device.json') # last used device
+capture = None # RingBuffer or BlockReducer, set by openStream
+overflows = 0 # number of input overflows reported to the audio callback
+onsetDetector = None
+doaEstimator = None # DoaEstimator, set by openStream with doaEstimation
+filterbank = None # Filterbank, set by openStream with bandFiltering
+aggregator = None # DeviceAggregator, set by openStream with aggregateDevices
+idleState = None # IdleState of the running radar (idleMode)
+recorder = None # TimelineRecorder of the running radar (recordTimeline)
+publisher = None # radarNet.SectorPublisher of the running radar (radarNet.publishUrl)
+def find_device_auto(search_keywords, device_type='input', exclude=()):
+    """Automatically find device by searching through keyword list (skipping the ids of `exclude`)"""
+    import sounddevice as sd
+    devices = sd.query_devices()
+    
+    # Try each keyword
+    for keyword in search_keywords:
+        keyword_lower = keyword.lower()
+        for i, device in enumerate(devices):
+            device_name = device['name'].lower()
+            max_input = device.get('max_input_channels', 0)
+            
+            if keyword_lower in device_name and i not in exclude:
+                if device_type == 'input' and max_input > 0:
+                    return i, device
+                elif device_type == 'any':
+                    return i, device
+    
+    return None, None
+
+def selectDevice(search_keywords):
+    """Return the id and infos of the input device.
+
+    The device of the last run is reused from deviceCacheFile when it is still
+    there (same name and channels), which avoids scanning all the devices.
+    """
+    import sounddevice as sd
+    cache = loadDeviceCache() or {}
+    device_id, device_info = cachedDevice(cache)
+    if device_id is not None:
+        print(f"✓ Cached device: {device_info['name']} (ID: {device_id})")
+        return device_id, device_info
+
+    # try to find the device automatically
+    device_id, device_info = find_device_auto(search_keywords, 'input')
+    if device_id is not None:
+        print(f"✓ Device found automatically: {device_info['name']} (ID: {device_id})")
+    else:
+        # Manual input if device not found automatically
+        print(sd.query_devices()) # print all devices available
+        device_id = int(input('device id:')) # if we want user to select device
+        device_info = sd.query_devices(device_id, 'input') # retrieve device infos
+    cache.update(deviceEntry(device_id, device_info))
+    saveDeviceCache(cache)
+    return device_id, device_info
+
+def selectExtraDevices(keywords, main_id):
+    """Return the (device_id, device_info) of the aggregateDevices found, other than the main device.
+
+    Like the main device, the device of each keyword is reused from
+    deviceCacheFile when it is still there.
+    """
+    if not keywords:
+        return []
+    cache = loadDeviceCache() or {}
+    cachedExtra = cache.get('extra', {})
+    extra = []
+    for keyword in keywords:
+        exclude = [main_id] + [i for i, _ in extra]
+        device_id, device_info = cachedDevice(cachedExtra.get(keyword))
+        if device_id is None or device_id in exclude:
+            device_id, device_info = find_device_auto([keyword], 'input', exclude)
+        if device_id is None:
+            print(f"✗ No other input device found for '{keyword}'")
+            cachedExtra.pop(keyword, None)
+            continue
+        print(f"✓ Aggregated device: {device_info['name']} (ID: {device_id}, {device_info['max_input_channels']} channels)")
+        extra.append((device_id, device_info))
+        cachedExtra[keyword] = deviceEntry(device_id, device_info)
+    if cachedExtra != cache.get('extra', {}):
+        cache['extra'] = cachedExtra
+        saveDeviceCache(cache)
+    return extra
+
+def cachedDevice(cached):
+    """(device_id, device_info) of a device cache entry if the device is still there (same name and channels)"""
+    import sounddevice as sd
+    if not cached or 'index' not in cached:
+        return None, None
+    try:
+        device_info = sd.query_devices(cached['index'], 'input')
+    except (ValueError, sd.PortAudioError):
+        return None, None
+    if device_info['name'] != cached['name'] or device_info['max_input_channels'] != cached['channels']:
+        return None, None
+    return cached['index'], device_info
+
+def deviceEntry(device_id, device_info):
+    return {'name': device_info['name'], 'index': device_id,
+            'channels': device_info['max_input_channels'], 'samplerate': device_info['default_samplerate']}
+
+def loadDeviceCache():
+    try:
+        with open(deviceCacheFile) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def saveDeviceCache(cache):
+    try:
+        with open(deviceCacheFile, 'w') as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"could not save the device cache: {e}", file=sys.stderr)
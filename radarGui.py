@@ -0,0 +1,442 @@
+"""Qt overlay of soundRadar: radar renderer, window and scheduler."""
+import collections
+import math
+import time
+from PyQt5 import QtWidgets, QtCore, QtGui
+import numpy as np
+
+import radarCore as core
+
+class ArcSpriteCache:
+    """LRU cache of pre-rendered arc pixmaps, limited in memory (bytes)"""
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.sprites = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.sprites.move_to_end(key)
+        return sprite
+
+    def put(self, key, sprite):
+        size = sprite.width() * sprite.height() * 4
+        if size > self.maxBytes:
+            return
+        self.sprites[key] = sprite
+        self.bytes += size
+        while self.bytes > self.maxBytes:
+            _, old = self.sprites.popitem(last=False)
+            self.bytes -= old.width() * old.height() * 4
+
+    def clear(self):
+        self.sprites.clear()
+        self.bytes = 0
+
+
+class RadarRenderer(QtWidgets.QWidget):
+    """Draws all the arcs of the radar in a single QPainter pass.
+
+    Strengths are quantized into `renderLevels` levels and the pen, color and
+    radius of every level are computed once per resize. A sector only triggers
+    a repaint when its level changes, and only its arc bounding rect is updated.
+    The estimated direction of arrival is drawn as a needle (see setBearing).
+    """
+    def __init__(self, parent=None, n_sectors=12):
+        super(RadarRenderer, self).__init__(parent)
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents, True)
+        self.n_sectors = n_sectors
+        self.levels = renderLevels
+        self.strength = np.zeros(n_sectors)
+        self.level = np.zeros(n_sectors, dtype=int)
+        self.rects = [QtCore.QRect() for _ in range(n_sectors)]
+        self.sprites = ArcSpriteCache(arcCacheBytes) if arcCache else None
+        self.bearing = None # (degrees, confidence level) of the needle, None if hidden
+        self.bearingRect = QtCore.QRect()
+        # clocklike positions, sector 0 centered on the front
+        span_deg = 360. / n_sectors
+        self.spanAngle = int(span_deg * 16)
+        self.startAngles = []
+        self.extents = [] # bounding box of each arc on the unit circle (screen coordinates)
+        for pos in range(n_sectors):
+            start_deg = 90 - span_deg / 2 + pos * span_deg
+            self.startAngles.append(int(start_deg * 16))
+            angles = [start_deg, start_deg + span_deg]
+            angles += [a for a in range(-360, 721, 90) if start_deg < a < start_deg + span_deg]
+            xs = [math.cos(math.radians(a)) for a in angles]
+            ys = [-math.sin(math.radians(a)) for a in angles]
+            self.extents.append((min(xs), max(xs), min(ys), max(ys)))
+        self.updateGeometryCache()
+
+    def resizeEvent(self, event):
+        self.updateGeometryCache()
+
+    def setVisualSettings(self):
+        """Apply a change of size_multiplier, opacity_multiplier or colorBands (pens, radii and sprites)"""
+        self.updateGeometryCache()
+
+    def updateGeometryCache(self):
+        """Compute the pen and the radius of every strength level for the current size and settings.
+
+        The arc sprites are drawn with these pens, so they are dropped as well.
+        """
+        w, h = self.width(), self.height()
+        self.cx, self.cy = w / 2, h / 2
+        # according to the screen size, set the radius
+        # smaller sound is closer to the center, larger sound is much further from the center
+        # First determine the maximum allowed radius ratio based on size_multiplier
+        if size_multiplier <= 1.0:
+            max_radius_ratio = 0.48
+        else:
+            # Scale from 0.48 (at 1.0) to 0.95 (at 5.0), and beyond 5.0 allow up to 0.98
+            if size_multiplier <= 5.0:
+                max_radius_ratio = 0.48 + (0.95 - 0.48) * ((size_multiplier - 1.0) / 4.0)
+            else:
+                # For size_multiplier > 5.0, scale from 0.95 to 0.98
+                max_radius_ratio = 0.95 + (0.98 - 0.95) * min((size_multiplier - 5.0) / 5.0, 1.0)
+        # all the levels at once
+        strength = np.arange(self.levels + 1) / self.levels
+        # according to the strength, set the color and transparency from the color bands
+        bounds = [bound for bound, _ in colorBands]
+        colors = np.array([rgba for _, rgba in colorBands])[np.searchsorted(bounds, strength, side='right')]
+        # Apply opacity multiplier
+        colors[:, 3] = np.clip((colors[:, 3] * opacity_multiplier).astype(int), 0, 255)
+        # according to the strength, set the pen width/radius
+        pen_width = 2 + 10 * strength  # 2~12px
+        # Calculate maximum allowed radius
+        max_radius = (min(w, h) / 2) * max_radius_ratio - pen_width
+        # Calculate min/max radius with size_multiplier scaling
+        desired_min_radius = min(w, h) * 0.18 * size_multiplier
+        max_min_ratio = 0.6  # min_radius is at most 60% of max_radius
+        actual_min_radius = np.minimum(desired_min_radius, max_radius * max_min_ratio)
+        min_r = actual_min_radius / size_multiplier
+        max_r = max_radius / size_multiplier
+        min_r = np.where(min_r >= max_r, max_r * max_min_ratio, min_r)
+        # Calculate radius based on strength
+        radius = (min_r + (max_r - min_r) * strength) * size_multiplier
+        self.radii = list(np.minimum(radius, max_radius))
+        self.pens = [QtGui.QPen(QtGui.QColor(*map(int, rgba)), width, QtCore.Qt.SolidLine, QtCore.Qt.RoundCap)
+                     for rgba, width in zip(colors, pen_width)]
+        for pos in range(self.n_sectors):
+            self.rects[pos] = self.arcRect(pos, self.level[pos])
+        self.bearingRect = self.needleRect()
+        if self.sprites is not None:
+            self.sprites.clear()
+        self.update()
+
+    def arcRect(self, pos, lvl):
+        """Bounding rect of the arc of a sector drawn at a given level"""
+        xmin, xmax, ymin, ymax = self.extents[pos]
+        r = self.radii[lvl]
+        pad = self.pens[lvl].widthF() / 2 + 2
+        left = math.floor(self.cx + r * xmin - pad)
+        top = math.floor(self.cy + r * ymin - pad)
+        right = math.ceil(self.cx + r * xmax + pad)
+        bottom = math.ceil(self.cy + r * ymax + pad)
+        return QtCore.QRect(left, top, right - left, bottom - top)
+
+    def setStrengths(self, strengths):
+        """Set the strength of every sector, repaint only the arcs whose level changed"""
+        self.strength[:] = strengths
+        levels = np.rint(self.strength * self.levels).astype(int)
+        for pos in np.flatnonzero(levels != self.level):
+            lvl = levels[pos]
+            self.level[pos] = lvl
+            rect = self.arcRect(pos, lvl)
+            self.update(self.rects[pos].united(rect))
+            self.rects[pos] = rect
+
+    def setBearing(self, azimuth, confidence):
+        """Set the direction of arrival (degrees clockwise from the front) and its confidence (0~1).
+
+        The needle is hidden below core.doaMinConfidence and only repainted when
+        its rounded direction or confidence level changes.
+        """
+        bearing = None
+        if confidence >= core.doaMinConfidence:
+            bearing = (int(round(azimuth)) % 360, int(round(min(confidence, 1.) * bearingLevels)))
+        if bearing == self.bearing:
+            return
+        self.bearing = bearing
+        rect = self.needleRect()
+        self.update(self.bearingRect.united(rect))
+        self.bearingRect = rect
+
+    def needleLine(self):
+        # same orientation as the sectors: sector pos is drawn at 90 + pos * span degrees
+        angle = math.radians(90 + self.bearing[0])
+        r0, r1 = self.radii[0], self.radii[-1]
+        return QtCore.QLineF(self.cx + r0 * math.cos(angle), self.cy - r0 * math.sin(angle),
+                             self.cx + r1 * math.cos(angle), self.cy - r1 * math.sin(angle))
+
+    def needleRect(self):
+        if self.bearing is None:
+            return QtCore.QRect()
+        line = self.needleLine()
+        return QtCore.QRectF(line.p1(), line.p2()).normalized().adjusted(-4, -4, 4, 4).toAlignedRect()
+
+    def drawArc(self, qp, pos, lvl):
+        radius = self.radii[lvl]
+        qp.setPen(self.pens[lvl])
+        rect = QtCore.QRectF(self.cx - radius, self.cy - radius, 2 * radius, 2 * radius)
+        qp.drawArc(rect, self.startAngles[pos], self.spanAngle)
+
+    def sprite(self, pos, lvl):
+        """Pixmap of the arc of a sector at a given level, covering its arcRect"""
+        key = (pos, lvl) # the cache is cleared with the geometry
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            rect = self.arcRect(pos, lvl)
+            ratio = self.devicePixelRatioF()
+            sprite = QtGui.QPixmap(int(math.ceil(rect.width() * ratio)), int(math.ceil(rect.height() * ratio)))
+            sprite.setDevicePixelRatio(ratio)
+            sprite.fill(QtCore.Qt.transparent)
+            qp = QtGui.QPainter(sprite)
+            qp.setRenderHint(QtGui.QPainter.Antialiasing, True)
+            qp.setBrush(QtCore.Qt.NoBrush)
+            qp.translate(-rect.left(), -rect.top())
+            self.drawArc(qp, pos, lvl)
+            qp.end()
+            self.sprites.put(key, sprite)
+        return sprite
+
+    def paintEvent(self, event):
+        t0 = time.perf_counter()
+        dirty = event.rect()
+        qp = QtGui.QPainter(self)
+        qp.setRenderHint(QtGui.QPainter.Antialiasing, True)
+        qp.setBrush(QtCore.Qt.NoBrush)
+        for pos in range(self.n_sectors):
+            if not self.rects[pos].intersects(dirty):
+                continue
+            lvl = self.level[pos]
+            if self.sprites is not None:
+                # blit the pre-rendered arc
+                qp.drawPixmap(self.rects[pos].topLeft(), self.sprite(pos, lvl))
+            else:
+                self.drawArc(qp, pos, lvl)
+        if self.bearing is not None and self.bearingRect.intersects(dirty):
+            alpha = int(255 * opacity_multiplier * self.bearing[1] / bearingLevels)
+            qp.setPen(QtGui.QPen(QtGui.QColor(255, 255, 255, alpha), 3, QtCore.Qt.SolidLine, QtCore.Qt.RoundCap))
+            qp.drawLine(self.needleLine())
+        qp.end()
+        if core.stats is not None:
+            core.stats.painted(t0, time.perf_counter())
+
+
+class ParentWidget(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(ParentWidget, self).__init__(parent)
+        self.setWindowFlags(
+            QtCore.Qt.FramelessWindowHint
+            | QtCore.Qt.WindowStaysOnTopHint
+            | QtCore.Qt.Tool
+        )
+        self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents, True)               
+        self.global_peak = 0.1
+        self.renderer = RadarRenderer(self, len(core.prevmax))
+        self.renderer.resize(self.width(), self.height())
+        self.setBackgroundcolor()
+        self.hudRect = QtCore.QRect(8, 8, 330, 90)
+        if SHOW_HUD and core.stats is not None:
+            # refresh the HUD twice a second, only its own rect
+            self.hudTimer = QtCore.QTimer(self)
+            self.hudTimer.timeout.connect(lambda: self.update(self.hudRect))
+            self.hudTimer.start(500)
+    def resizeEvent(self, event):
+        self.renderer.resize(self.width(), self.height())
+    def paintEvent(self, event):
+        if not (SHOW_HUD and core.stats is not None):
+            return
+        qp = QtGui.QPainter(self)
+        qp.fillRect(self.hudRect, QtGui.QColor(0, 0, 0, 140))
+        qp.setPen(QtGui.QColor(230, 230, 230))
+        qp.setFont(QtGui.QFont('Monospace', 8))
+        text = '\n'.join([f"{'':<14}{'p50':>6}{'p95':>7}{'p99':>7}"] + core.stats.hudLines())
+        qp.drawText(self.hudRect.adjusted(6, 4, -6, -4), QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop, text)
+        qp.end()
+    def updateSectors(self, values):
+        # strengths of all the sectors at once (values: sector max, e.g. core.prevmax)
+        strengths, self.global_peak = core.sectorStrengths(values, self.global_peak)
+        self.renderer.setStrengths(strengths)
+    def setBearing(self, azimuth, confidence):
+        # continuous direction of arrival, see core.DoaEstimator
+        self.renderer.setBearing(azimuth, confidence)
+    def setVisualSettings(self):
+        # call after changing size_multiplier, opacity_multiplier or colorBands at runtime
+        self.renderer.setVisualSettings()
+    def setIdle(self, idle):
+        # nothing changes while idle, stop the HUD refresh as well
+        if hasattr(self, 'hudTimer'):
+            if idle:
+                self.hudTimer.stop()
+            else:
+                self.hudTimer.start(500)
+                self.update(self.hudRect)
+    def setBackgroundcolor(self):
+        self.p = QtWidgets.QWidget.palette(self)
+        self.p.setColor(self.backgroundRole(),QtGui.QColor(0,0,0,0))
+        self.setPalette(self.p)
+
+
+class RadarScheduler(QtCore.QObject):
+    """Fixed-rate tick driven by the Qt event loop.
+
+    Deadlines are kept on an absolute grid (start + k * period), so the work time
+    is not added on top of the period and the tick does not drift. Deadlines
+    which are already in the past when a tick runs are skipped and counted in
+    `missed`.
+    """
+    def __init__(self, callback, rate, parent=None):
+        super(RadarScheduler, self).__init__(parent)
+        self.callback = callback
+        self.period = 1. / rate
+        self.ticks = 0 # number of ticks run
+        self.missed = 0 # number of ticks skipped because we were late
+        self.woken = 0 # number of extra ticks run by wake()
+        self.deadline = 0.
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._tick)
+
+    def setRate(self, rate):
+        self.period = 1. / rate
+        if self.timer.isActive():
+            self.start()
+
+    def start(self):
+        self.deadline = time.perf_counter() + self.period
+        self.timer.start(int(self.period * 1000))
+
+    def stop(self):
+        self.timer.stop()
+
+    def wake(self):
+        """Run the callback now, outside of the regular grid (e.g. on a sound onset)"""
+        self.woken += 1
+        self.callback()
+
+    def _tick(self):
+        late = time.perf_counter() - self.deadline
+        if late >= self.period:
+            skipped = int(late // self.period)
+            self.missed += skipped
+            if core.stats is not None:
+                core.stats.count('missed ticks', skipped)
+            self.deadline += skipped * self.period
+        self.deadline += self.period
+        self.ticks += 1
+        self.callback()
+        delay = self.deadline - time.perf_counter()
+        self.timer.start(max(0, int(round(delay * 1000))))
+
+
+class OnsetSignal(QtCore.QObject):
+    """Posts the onsets and the idle wake-ups detected in the audio thread to the GUI thread"""
+    onset = QtCore.pyqtSignal()
+    wake = QtCore.pyqtSignal()
+
+
+class WakeNotifier(QtCore.QObject):
+    """Calls `callback` in the GUI thread when bytes arrive on a socket (wake-ups of the DSP process)"""
+    def __init__(self, sock, callback, parent=None):
+        super(WakeNotifier, self).__init__(parent)
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.callback = callback
+        self.notifier = QtCore.QSocketNotifier(sock.fileno(), QtCore.QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self._read)
+
+    def _read(self):
+        try:
+            data = self.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.notifier.setEnabled(False) # the other side is closed
+            return
+        self.callback()
+
+
+class TimelinePlayer(QtCore.QObject):
+    """Replays a recorded timeline (core.Timeline) on a ParentWidget.
+
+    The timeline is memory-mapped, so seeking is a binary search on the time
+    column. At high speed every refresh shows the max of the records skipped
+    since the previous one, so short sounds are not lost. Keys: Space pauses,
+    Left/Right seek 10 s, Up/Down double/halve the speed (1x~50x).
+    """
+    def __init__(self, window, timeline, speed=1., position=0., parent=None):
+        super(TimelinePlayer, self).__init__(parent)
+        self.window = window
+        self.timeline = timeline
+        self.paused = False
+        self.setSpeed(speed)
+        self.seek(position)
+        self.scheduler = RadarScheduler(self._tick, core.refreshRate, self)
+        for key, action in ((QtCore.Qt.Key_Space, self.togglePause),
+                            (QtCore.Qt.Key_Left, lambda: self.seek(self.position - 10)),
+                            (QtCore.Qt.Key_Right, lambda: self.seek(self.position + 10)),
+                            (QtCore.Qt.Key_Up, lambda: self.setSpeed(self.speed * 2)),
+                            (QtCore.Qt.Key_Down, lambda: self.setSpeed(self.speed / 2))):
+            shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(key), window)
+            shortcut.setContext(QtCore.Qt.ApplicationShortcut)
+            shortcut.activated.connect(action)
+
+    def start(self):
+        self.clock = time.perf_counter()
+        self.scheduler.start()
+
+    def seek(self, position):
+        self.position = max(0., min(position, self.timeline.duration))
+        self.lastIndex = None # do not merge the records across a seek
+        print(f"{self.position:.1f}s / {self.timeline.duration:.1f}s", flush=True)
+
+    def setSpeed(self, speed):
+        self.speed = max(1., min(speed, 50.))
+
+    def togglePause(self):
+        self.paused = not self.paused
+
+    def _tick(self):
+        now = time.perf_counter()
+        if not self.paused:
+            self.position = min(self.position + (now - self.clock) * self.speed, self.timeline.duration)
+        self.clock = now
+        if not len(self.timeline):
+            return
+        index = self.timeline.index(self.position)
+        if self.lastIndex is None or index <= self.lastIndex:
+            core.prevmax[:] = self.timeline.values[index]
+        else:
+            core.prevmax[:] = self.timeline.values[self.lastIndex + 1:index + 1].max(axis=0)
+        self.lastIndex = index
+        self.window.updateSectors(core.prevmax)
+
+
+# Visualization settings (call ParentWidget.setVisualSettings() after changing them at runtime)
+size_multiplier = 15.0  # Radar size multiplier (0.5 ~ 15.0, default: 15.0)
+opacity_multiplier = 0.7  # Opacity multiplier (0.0 ~ 1.0, default: 1.0)
+# color of the arcs, from the center to the outside: (strength upper bound, (r, g, b, alpha))
+colorBands = [
+    (0.25, (60, 200, 60, 40)),  # very small sound: inside, light green, almost transparent
+    (0.4, (40, 255, 80, 90)),  # small to medium: dark green
+    (0.75, (255, 220, 60, 150)),  # middle: yellow (wider range to make it more visible)
+    (float('inf'), (255, 120, 40, 220)),  # very large sound: orange/red, opaque
+]
+renderLevels = 64  # number of quantized strength levels (an arc is only repainted when its level changes)
+arcCache = True  # blit pre-rendered arcs instead of stroking them on every paint
+arcCacheBytes = 64 * 2 ** 20  # memory cap of the arc cache (least recently used arcs are evicted)
+bearingLevels = 16  # number of opacity levels of the direction of arrival needle
+SHOW_HUD = False # draw the timings on the overlay
+dspPollRate = 60 # with dspProcess, rate (Hz) at which the GUI reads the snapshot (core.idleRate while the DSP loop is idle, it wakes the GUI)
@@ -0,0 +1,291 @@
+"""Network output of soundRadar: the sector values of every tick as packed frames.
+
+Each frame is FRAME_HEADER (magic, sequence number, time, number of sectors)
+followed by the sector values as float32, so a frame has a fixed size for a
+given layout. Frames go over UDP (multicast or unicast) or a local WebSocket
+(binary messages), and the receiver shows them on the overlay:
+
+    python soundRadar.py --receive udp://239.255.42.99:50499
+    python soundRadar.py --receive ws://127.0.0.1:50500
+
+Only depends on the standard library and NumPy.
+"""
+import base64
+import hashlib
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+FRAME_HEADER = struct.Struct('<4sIdHxx') # magic, sequence number, time (epoch), number of sectors
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def packFrame(seq, now, values):
+    values = np.asarray(values, dtype=np.float32)
+    return FRAME_HEADER.pack(b'SRAD', seq & 0xffffffff, now, len(values)) + values.tobytes()
+
+
+def unpackFrame(frame):
+    """Return (seq, time, values) of a frame (None if it is not a radar frame)"""
+    if len(frame) < FRAME_HEADER.size:
+        return None
+    magic, seq, now, n = FRAME_HEADER.unpack_from(frame)
+    if magic != b'SRAD' or len(frame) != FRAME_HEADER.size + 4 * n:
+        return None
+    return seq, now, np.frombuffer(frame, dtype=np.float32, offset=FRAME_HEADER.size)
+
+
+class SectorPublisher:
+    """Sends the sector values of every tick from background threads.
+
+    `publish` only packs the frame and replaces the latest one, it never waits
+    on the network. Every destination (the UDP socket, or each WebSocket
+    client) has its own sender thread which always sends the latest frame, so
+    a slow client skips frames instead of slowing down the radar.
+    """
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.address = (parts.hostname, parts.port)
+        self.frame = None
+        self.seq = 0
+        self.sent = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.sockets = []
+        if self.scheme == 'udp':
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if isMulticast(parts.hostname):
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, multicastTTL)
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1) # receivers on the same machine
+            self.sockets.append(sock)
+            self._thread(self._sendLoop, lambda frame: sock.sendto(frame, self.address))
+        elif self.scheme == 'ws':
+            self.server = socket.create_server(self.address)
+            self.sockets.append(self.server)
+            self._thread(self._accept)
+        else:
+            raise ValueError(f"unknown transport: {url} (udp://host:port or ws://host:port)")
+
+    def _thread(self, target, *args):
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def publish(self, values, now=None):
+        frame = packFrame(self.seq + 1, time.time() if now is None else now, values)
+        with self.cond:
+            self.seq += 1
+            self.frame = frame
+            self.cond.notify_all()
+
+    def _sendLoop(self, send, conn=None):
+        """Send the latest frames until closed, or until the WebSocket connection `conn` fails"""
+        last = self.seq
+        failing = False
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.seq != last or self.closed)
+                if self.closed:
+                    return
+                frame, last = self.frame, self.seq
+            try:
+                send(frame)
+            except OSError as e:
+                if conn is not None:
+                    return # client gone
+                # UDP: the network can come back (Wi-Fi drop, sleep/resume), keep sending
+                if not failing:
+                    print(f"radar frames not sent: {e}", file=sys.stderr)
+                failing = True
+                continue
+            if failing:
+                print("radar frames sent again", file=sys.stderr)
+                failing = False
+            self.sent += 1
+
+    def _accept(self):
+        while not self.closed:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.sockets.append(conn)
+            self._thread(self._serve, conn)
+
+    def _serve(self, conn):
+        """Thread of a WebSocket client: handshake, then its frames until it goes away"""
+        try:
+            conn.settimeout(2) # a slow client only delays its own thread
+            wsHandshake(conn)
+            conn.settimeout(None)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sendLoop(lambda frame: conn.sendall(wsFrame(frame)), conn)
+        except (OSError, ValueError):
+            pass
+        finally:
+            conn.close()
+            try:
+                self.sockets.remove(conn)
+            except ValueError:
+                pass
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        for sock in list(self.sockets):
+            sock.close()
+
+
+class SectorReceiver:
+    """Receives the frames of a SectorPublisher in a background thread.
+
+    Same `read` interface as core.SectorSnapshot, so the overlay shows it with
+    core.updateFromSnapshot.
+    """
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.latest = None
+        self.lastSeq = None
+        self.received = 0
+        self.lock = threading.Lock()
+        self.first = threading.Event()
+        if parts.scheme == 'udp':
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if isMulticast(parts.hostname):
+                self.sock.bind(('', parts.port))
+                membership = socket.inet_aton(parts.hostname) + socket.inet_aton('0.0.0.0')
+                self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            else:
+                self.sock.bind((parts.hostname, parts.port))
+            frames = self._udpFrames
+        elif parts.scheme == 'ws':
+            self.sock = socket.create_connection((parts.hostname, parts.port))
+            self.file = wsConnect(self.sock, parts.hostname, parts.port)
+            frames = self._wsFrames
+        else:
+            raise ValueError(f"unknown transport: {url} (udp://host:port or ws://host:port)")
+        threading.Thread(target=self._receive, args=(frames,), daemon=True).start()
+
+    def _udpFrames(self):
+        while True:
+            yield self.sock.recv(65536)
+
+    def _wsFrames(self):
+        f = self.file
+        while True:
+            head = f.read(2)
+            if len(head) < 2:
+                return
+            n = head[1] & 0x7f
+            if n == 126:
+                n, = struct.unpack('>H', f.read(2))
+            elif n == 127:
+                n, = struct.unpack('>Q', f.read(8))
+            payload = f.read(n)
+            if head[0] & 0x0f == 0x2: # binary message
+                yield payload
+
+    def _receive(self, frames):
+        try:
+            for frame in frames():
+                frame = unpackFrame(frame)
+                if frame is None:
+                    continue
+                with self.lock:
+                    # UDP can reorder: keep the most recent frame
+                    if self.latest is None or (frame[0] - self.latest[0]) & 0xffffffff < 0x80000000:
+                        self.latest = frame
+                self.received += 1
+                self.first.set()
+        except OSError:
+            pass
+
+    def waitFirst(self, timeout=None):
+        """Wait for the first frame, return its number of sectors (None on timeout)"""
+        if not self.first.wait(timeout):
+            return None
+        return len(self.latest[2])
+
+    def read(self, out):
+        """Copy the latest values in out, return their time (None if they did not change)"""
+        with self.lock:
+            latest = self.latest
+        if latest is None or latest[0] == self.lastSeq:
+            return None
+        seq, now, values = latest
+        out[:] = values
+        self.lastSeq = seq
+        return now
+
+    def close(self):
+        if hasattr(self, 'file'):
+            # the file keeps the WebSocket connection open, and closing it waits for the blocked read
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.file.close()
+        self.sock.close()
+
+
+def isMulticast(host):
+    try:
+        return 224 <= int(socket.inet_aton(host)[0]) <= 239
+    except OSError:
+        return False
+
+
+def wsHandshake(conn):
+    """Server side of the WebSocket opening handshake"""
+    request = b''
+    while b'\r\n\r\n' not in request:
+        data = conn.recv(4096)
+        if not data:
+            raise ValueError("connection closed during the handshake")
+        request += data
+    key = None
+    for line in request.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'sec-websocket-key':
+            key = value.strip()
+    if key is None:
+        raise ValueError("not a WebSocket request")
+    accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest())
+    conn.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                 b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+
+
+def wsConnect(sock, host, port):
+    """Client side of the WebSocket opening handshake, return the file to read the messages from"""
+    key = base64.b64encode(os.urandom(16))
+    sock.sendall(b'GET / HTTP/1.1\r\nHost: %s:%d\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                 b'Sec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\n\r\n' % (host.encode(), port, key))
+    f = sock.makefile('rb')
+    status = f.readline()
+    if b' 101 ' not in status:
+        raise OSError(f"WebSocket handshake refused: {status.strip()!r}")
+    while f.readline() not in (b'\r\n', b''):
+        pass # response headers
+    return f
+
+
+def wsFrame(payload):
+    """Unmasked binary WebSocket message (server to client)"""
+    n = len(payload)
+    if n < 126:
+        return bytes((0x82, n)) + payload
+    if n < 65536:
+        return bytes((0x82, 126)) + struct.pack('>H', n) + payload
+    return bytes((0x82, 127)) + struct.pack('>Q', n) + payload
+
+
+# Network settings
+publishUrl = None # publish the sectors of every tick: None (off), 'udp://239.255.42.99:50499' or 'ws://127.0.0.1:50500'
+multicastTTL = 1 # hops of the multicast frames (1 = local network)
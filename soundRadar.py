@@ -1,527 +1,182 @@
 import sys
-from PyQt5 import QtWidgets, QtCore, QtGui
-import math
-import numpy as np
-import queue
-import sounddevice as sd
+import argparse
+import multiprocessing
+import signal
+import socket
 import time
 
-class TranslucentWidget(QtWidgets.QWidget):
-    def __init__(self, parent=None, position=0):
-        super(TranslucentWidget, self).__init__(parent)
-        # make the window frameless
-        self.setWindowFlags(QtCore.Qt.FramelessWindowHint)
-        self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
-        self.popup_fillColor = QtGui.QColor(240, 240, 240, 255)
-        self.popup_penColor = QtGui.QColor(200, 200, 200, 255)
-        self.position = position
-        
-        self.strength = 0.0
-    def resizeEvent(self, event):
-        s = self.size()
-        popup_width = 300
-        popup_height = 120
-        ow = int(s.width() / 2 - popup_width / 2)
-        oh = int(s.height() / 2 - popup_height / 2)
-    def createPoly(self, p, r=20, n=20):
-        polygon = QtGui.QPolygonF()
-        polygon.append(QtCore.QPointF(self.width()/2, self.height()/2)) #center of circle
-        for i in range(n):                                              # add the points of polygon
-            t = -105 + p * 30 + (30. / n) * i
-            x = r*math.cos(math.radians(t))
-            y = r*math.sin(math.radians(t))
-            polygon.append(QtCore.QPointF(self.width()/2 +x, self.height()/2 + y))  
-        polygon.append(QtCore.QPointF(self.width()/2, self.height()/2)) #center of circle
-        return polygon
-    def paintEvent(self, event):
-        # This method is drawing the contents of your window.
-        # get current window size
-        s = self.size()
-        w, h = s.width(), s.height()
-        cx, cy = w / 2, h / 2
+# the heavy modules (NumPy, Qt, PortAudio) are only imported once we know what to run:
+# radarCore (NumPy) holds the capture and the sector engine, radarGui (Qt) the overlay
 
-        qp = QtGui.QPainter(self)
-        qp.setRenderHint(QtGui.QPainter.Antialiasing, True)
 
-        strength = getattr(self, "strength", 0.0)
-        strength = max(0.0, min(1.0, float(strength)))
-
-        # according to the strength, set the color and transparency
-        # very low: light green, low: dark green, mid: yellow, high: orange/red
-        if strength < 0.25:
-            # very small sound: inside, light green, almost transparent
-            r, g, b, alpha = 60, 200, 60, 40
-        elif strength < 0.4:
-            # small to medium: dark green
-            r, g, b, alpha = 40, 255, 80, 90
-        elif strength < 0.75:
-            # middle: yellow (wider range to make it more visible)
-            r, g, b, alpha = 255, 220, 60, 150
-        else:
-            # very large sound: orange/red, opaque
-            r, g, b, alpha = 255, 120, 40, 220
-
-        # Apply opacity multiplier
-        alpha = int(alpha * opacity_multiplier)
-        alpha = max(0, min(255, alpha))
-
-        color = QtGui.QColor(r, g, b, alpha)
-
-        # according to the strength, set the pen width/radius
-        pen_width = 2 + 10 * strength  # 2~12px
-        qp.setPen(QtGui.QPen(color, pen_width, QtCore.Qt.SolidLine, QtCore.Qt.RoundCap))
-        qp.setBrush(QtCore.Qt.NoBrush)
-
-        # according to the screen size, set the radius
-        # smaller sound is closer to the center, larger sound is much further from the center
-        # First determine the maximum allowed radius ratio based on size_multiplier
-        if size_multiplier <= 1.0:
-            max_radius_ratio = 0.48
-        else:
-            # Scale from 0.48 (at 1.0) to 0.95 (at 5.0), and beyond 5.0 allow up to 0.98
-            if size_multiplier <= 5.0:
-                max_radius_ratio = 0.48 + (0.95 - 0.48) * ((size_multiplier - 1.0) / 4.0)
-            else:
-                # For size_multiplier > 5.0, scale from 0.95 to 0.98
-                max_radius_ratio = 0.95 + (0.98 - 0.95) * min((size_multiplier - 5.0) / 5.0, 1.0)
-        # Calculate maximum allowed radius
-        max_radius = (min(w, h) / 2) * max_radius_ratio - pen_width
-        # Calculate min/max radius with size_multiplier scaling
-        desired_min_radius = min(w, h) * 0.18 * size_multiplier
-        max_min_ratio = 0.6  # min_radius is at most 60% of max_radius
-        actual_min_radius = min(desired_min_radius, max_radius * max_min_ratio)
-        min_r = actual_min_radius / size_multiplier
-        max_r = max_radius / size_multiplier
-        if min_r >= max_r:
-            min_r = max_r * max_min_ratio
-        # Calculate radius based on strength
-        radius = (min_r + (max_r - min_r) * strength) * size_multiplier
-        radius = min(radius, max_radius)
-
-        rect = QtCore.QRectF(cx - radius, cy - radius, 2 * radius, 2 * radius)
-
-        start_deg = -105 + self.position * 30 + 180
-        span_deg = 30
-        start_angle = int(start_deg * 16)
-        span_angle = int(span_deg * 16)
-
-        qp.drawArc(rect, start_angle, span_angle)
-        qp.end()
-
-
-class ParentWidget(QtWidgets.QWidget):
-    def __init__(self, parent=None):
-        super(ParentWidget, self).__init__(parent)
-        self.setWindowFlags(
-            QtCore.Qt.FramelessWindowHint
-            | QtCore.Qt.WindowStaysOnTopHint
-            | QtCore.Qt.Tool
-        )
-        self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
-        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents, True)               
-        self.popframes = {}
-        self._popflag = False
-        self.global_peak = 0.1
-
-        for i in range(12):
-            self.create_shape(position=i)
-        for item in self.popframes:
-            self.popframes[item]['shape'].move(0, 0)
-            self.popframes[item]['shape'].resize(self.width(), self.height())
-        self.setBackgroundcolor()
-    def resizeEvent(self, event):
-        if self._popflag:
-            for item in self.popframes:
-                self.popframes[item]['shape'].move(0, 0)
-                self.popframes[item]['shape'].resize(self.width(), self.height())
-    def create_shape(self, position=0):
-        popframe = TranslucentWidget(self, position)
-        popframe.move(0, 0)
-        popframe.resize(self.width(), self.height())
-        self._popflag = True
-        self.popframes[position] = {}
-        self.popframes[position]['shape'] = popframe
-        self.popframes[position]['shape'].show()
-        self.popframes[position]['tupdate'] = 0
-        self.popframes[position]['fistFlag'] = False
-    def updateBrush(self, color, position):
-        # update the color of the selected zone
-        # color is a (1,3) array containing the RGB colors
-        # position is an int giving the clocklike position
-        r = int(color[0])
-        g = int(color[1])
-        b = int(color[2])
-        r = max(0, min(255, r))
-        g = max(0, min(255, g))
-        b = max(0, min(255, b))
-
-        try:
-            raw = float(prevmax[position])
-            raw = max(0.0, min(1.0, raw))
-            # according to the strength mode, set the processing method
-            from math import pow as mpow
-            if STRENGTH_MODE == 1:
-                # mode 1: only emphasize the strongest direction among all
-                # track the recent global peak (slowly decreasing)
-                self.global_peak = max(self.global_peak * 0.9, raw, 1e-3)
-                ratio = raw / (self.global_peak + 1e-6)
-                # only keep the values around the largest value (0.6 or higher) and almost 0 for the rest
-                if ratio < 0.6:
-                    strength = 0.0
-                else:
-                    strength = (ratio - 0.6) / 0.4  # 0.6→0, 1.0→1
-            else:
-                # mode 2: show multiple directions, but the strongest direction is much more prominent
-                # square the values to make smaller values smaller and larger values stay the same
-                strength = raw * raw
-            strength = max(0.0, min(1.0, strength))
-            self.popframes[position]['shape'].strength = strength
-        except Exception:
-            self.popframes[position]['shape'].strength = 0.0      
-        self.update()
-    def setBackgroundcolor(self):
-        self.p = QtWidgets.QWidget.palette(self)
-        self.p.setColor(self.backgroundRole(),QtGui.QColor(0,0,0,0))
-        self.setPalette(self.p)
-
-
-
-
-
-def audio_callback(indata, frames, time, status):
-    """This is called (from a separate thread) for each audio block.
-    Shape of outdata is (frames, channels)"""
-    if status:
-        print(status, file=sys.stderr)
-    # Fancy indexing with mapping creates a (necessary!) copy:
-    q.put(indata[:])
-
-def getMaxSound(n_chans):
-    """This is called by process to update values for each channel
-
-    Typically, audio callbacks happen more frequently than plot updates,
-    therefore the queue tends to contain multiple blocks of audio data.
-    """
-    maxVals = np.zeros(n_chans)
-    while True:        
-        try:
-            data = q.get_nowait()
-        except queue.Empty:
-            break
-    if 'data' in locals():
-        maxVals = np.nanmax(np.append([maxVals],data,axis=0),axis=0)
-    return maxVals/maxSoundValue # return sound in percentage
-
-def enhancer(x):
-    if x < minThreshold:
-        return 0
-    else:
-        # Apply a smooth curve instead of binary 0/1
-        # This preserves intermediate values for yellow color range
-        normalized = (x - minThreshold) / (1.0 - minThreshold)
-        # Apply a power curve to enhance larger values while keeping gradual transition
-        return normalized ** 0.7
-
-def initfilter(x, t):
-    x[x<t] = 0
-    return np.fromiter((expfilter(xi) for xi in x), x.dtype)
- 
-def expfilter(x):
-    return 1 - math.exp(-5*x)
-
-# Exponential fade effect
-def apply_fade(current_value, elapsed_time, decay_rate=2.0):
-    """Apply exponential decay fade - natural fade out"""
-    return current_value * math.exp(-decay_rate * elapsed_time)
-
-def updateRadar(radarObject):
-    while True:
-        # process input
-        time.sleep(refreshtime)
-        maxValues = getMaxSound(n_channel)
-        maxValues = initfilter(maxValues, minThreshold)
-        if DEBUG:
-            print(maxValues[[0,1,4,5,6,7]]*100) # this will generate a lot of output. Could be improved by updating the line instead of printing a new line :o)
-        for pos in radarObject.popframes:
-            # update each part of the "radar"
-            if pos == 0:
-                if ((maxValues[mapping['avg']] + maxValues[mapping['avd']]) / 2 ) > prevmax[pos]:
-                    # valid for the center (diff < maxdifmain) and higher than previous max - if not valid : reduce prevmax
-                    prevmax[pos] = ((maxValues[mapping['avg']] + maxValues[mapping['avd']]) / 2 )
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 1:
-                if (maxValues[mapping['avd']] - maxValues[mapping['avg']]) / min(maxValues[mapping['avg']],maxValues[mapping['avd']]) > maxdifmain and (maxValues[mapping['avd']] - maxValues[mapping['avg']]) > prevmax[pos]:
-                    # valid if avd larger than avg of at least maxdifmain percents
-                    prevmax[pos] = (maxValues[mapping['avd']] - maxValues[mapping['avg']]) 
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 2:
-                if maxValues[mapping['d']] > maxValues[mapping['avd']] and maxValues[mapping['d']] - maxValues[mapping['avd']] > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['d']] - maxValues[mapping['avd']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 3:
-                if maxValues[mapping['d']] > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['d']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 4:
-                if maxValues[mapping['d']] > maxValues[mapping['ard']] and maxValues[mapping['d']] - maxValues[mapping['ard']] > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['d']] - maxValues[mapping['ard']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 5:
-                if (maxValues[mapping['ard']] - maxValues[mapping['arg']]) / min(maxValues[mapping['arg']],maxValues[mapping['ard']]) > maxdifmain and (maxValues[mapping['ard']] - maxValues[mapping['arg']]) > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['ard']] - maxValues[mapping['arg']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 6:
-                if  ((maxValues[mapping['arg']] + maxValues[mapping['ard']]) / 2 ) > prevmax[pos]:
-                    prevmax[pos] = (maxValues[mapping['arg']] + maxValues[mapping['ard']]) / 2
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 7:
-                if (maxValues[mapping['arg']] - maxValues[mapping['ard']]) / min(maxValues[mapping['ard']],maxValues[mapping['arg']]) > maxdifmain and (maxValues[mapping['arg']] - maxValues[mapping['ard']]) > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['arg']] - maxValues[mapping['ard']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 8:
-                if maxValues[mapping['g']] > maxValues[mapping['arg']] and maxValues[mapping['g']] - maxValues[mapping['arg']] > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['g']] - maxValues[mapping['arg']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 9:
-                if maxValues[mapping['g']] > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['g']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 10:
-                if maxValues[mapping['g']] > maxValues[mapping['avg']] and maxValues[mapping['g']] - maxValues[mapping['avg']] > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['g']] - maxValues[mapping['avg']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if pos == 11:
-                if (maxValues[mapping['avg']] - maxValues[mapping['avd']]) / min(maxValues[mapping['avg']],maxValues[mapping['avd']]) > maxdifmain and (maxValues[mapping['avg']] - maxValues[mapping['avd']]) > prevmax[pos]:
-                    prevmax[pos] = maxValues[mapping['avg']] - maxValues[mapping['avd']]
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                    radarObject.popframes[pos]['fistFlag'] = True
-                    prevmax[pos] = enhancer(prevmax[pos])
-                elif radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTFU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['fistFlag'] = False
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-                elif not radarObject.popframes[pos]['fistFlag'] and time.time() - radarObject.popframes[pos]['tupdate'] > minTBU:
-                    elapsed_time = time.time() - radarObject.popframes[pos]['tupdate']
-                    prevmax[pos] = apply_fade(prevmax[pos], elapsed_time, fade_decay_rate)
-                    radarObject.popframes[pos]['tupdate'] = time.time()
-            if prevmax[pos] < 0.01:
-                prevmax[pos]=0
-            radarObject.updateBrush([0, prevmax[pos] * maxColorRange, 0], pos)
-        if DEBUG:
-            print(prevmax)
-            print('----')
-        QtWidgets.QApplication.processEvents() #update GUI in a loop process
-
-
-
-
-
-# GLOBAL PARAMETERS (should be in capital... at least the title is in capital :o) )
-n_chans=8 # number of channels on sound device
-n_channel = n_chans # yup, that's badly coded :o)
-maxSoundValue = 2. ** 32 /2 # to be updated according to the dtype stream recording
-
-STRENGTH_MODE = 2
-mapping = {}
-mapping['avg'] = 1 - 1  # avg = front left
-mapping['avd'] = 2 - 1  # avd = front right
-mapping['d'] = 8 - 1    # d = right
-mapping['g'] = 7 - 1    # g = left
-mapping['arg'] = 5 - 1  # arg = back left
-mapping['ard'] = 6 - 1  # ard = back right
-minTFU = 0.5 # minimum Time needed for First Update (upper sound value)
-minTBU = 0.1 # minimum Time needed Between Update (lower sound value)
-maxdifmain = 0.01 # max percentage difference between main front/back channels
-maxColorRange = 255 # max value for color
-minThreshold = 0.005 # lowpass filter threshold on maxValues
-prevmax = np.zeros(12) # initialize the "previous max" value
-redfactor = 5 #reduction factor if no upper value recorded
-refreshtime = 0.1 # time between two refresh
-
-# Fade effect settings
-fade_decay_rate = 2.0  # Exponential decay rate (higher = faster fade out)
-
-# Visualization settings
-size_multiplier = 15.0  # Radar size multiplier (0.5 ~ 15.0, default: 15.0)
-opacity_multiplier = 0.7  # Opacity multiplier (0.0 ~ 1.0, default: 1.0)
-
-DEBUG = True
-def find_device_auto(search_keywords, device_type='input'):
-    """Automatically find device by searching through keyword list"""
-    devices = sd.query_devices()
-    
-    # Try each keyword
-    for keyword in search_keywords:
-        keyword_lower = keyword.lower()
-        for i, device in enumerate(devices):
-            device_name = device['name'].lower()
-            max_input = device.get('max_input_channels', 0)
-            
-            if keyword_lower in device_name:
-                if device_type == 'input' and max_input > 0:
-                    return i, device
-                elif device_type == 'any':
-                    return i, device
-    
-    return None, None
-
-if __name__ == "__main__":
-    q = queue.Queue()
-    app = QtWidgets.QApplication(sys.argv)
-    mainwindow = ParentWidget()
+def makeWindow(gui):
+    """Create and show the overlay window"""
+    mainwindow = gui.ParentWidget()
     # Adjust window size based on size_multiplier for better visibility
     base_size = 500
-    window_size = int(base_size * (1.0 + max(0, (size_multiplier - 5.0) * 0.1)))
+    window_size = int(base_size * (1.0 + max(0, (gui.size_multiplier - 5.0) * 0.1)))
     mainwindow.resize(window_size, window_size)
     mainwindow.show()
-    
-    # try to find the device automatically
-    search_keywords = ['CABLE Output', 'VB-Audio Virtual Cable', 'VB-Audio']
-    device_id, found_device = find_device_auto(search_keywords, 'input')
-    
-    if device_id is not None:
-        print(f"✓ Device found automatically: {found_device['name']} (ID: {device_id})")
-        device_info = found_device
-    else:
-        # Manual input if device not found automatically
-        print(sd.query_devices()) # print all devices available
-        device_id = int(input('device id:')) # if we want user to select device
-        device_info = sd.query_devices(device_id, 'input') # retrieve device infos
+    return mainwindow
+
+
+def replay(args):
+    import numpy as np
+    import radarCore as core
+    core.DEBUG = False
+    audio = core.AudioFile(args.replay, args.channels, args.samplerate, args.dtype)
+    t0 = time.perf_counter()
+    timeline = core.replayAudio(audio.chunks(args.blocksize), audio.samplerate, audio.n_chans, audio.maxValue, args.blocksize)
+    elapsed = time.perf_counter() - t0
+    duration = audio.frames / audio.samplerate
+    print(f"replayed {duration:.1f}s of audio in {elapsed:.2f}s ({duration / max(elapsed, 1e-9):.0f}x real time), {len(timeline)} ticks", file=sys.stderr)
+    header = ','.join(['t'] + [f's{pos}' for pos in range(len(core.prevmax))])
+    np.savetxt(args.out if args.out else sys.stdout, timeline, fmt='%.6g', delimiter=',', header=header, comments='')
+
+
+def playTimeline(args):
+    from PyQt5 import QtWidgets
+    import numpy as np
+    import radarCore as core
+    import radarGui as gui
+
+    timeline = core.Timeline(args.timeline)
+    core.prevmax = np.zeros(timeline.n_sectors) # the widget shows as many sectors as recorded
+    app = QtWidgets.QApplication(sys.argv)
+    mainwindow = makeWindow(gui)
+    player = gui.TimelinePlayer(mainwindow, timeline, args.speed, args.seek)
+    player.start()
+    app.exec_()
+
+
+def receive(args):
+    from PyQt5 import QtWidgets
+    import numpy as np
+    import radarCore as core
+    import radarGui as gui
+    import radarNet as net
+
+    receiver = net.SectorReceiver(args.receive)
+    print(f"Waiting for the radar on {args.receive}...")
+    core.prevmax = np.zeros(receiver.waitFirst()) # the widget shows as many sectors as published
+    app = QtWidgets.QApplication(sys.argv)
+    mainwindow = makeWindow(gui)
+    scheduler = gui.RadarScheduler(lambda: core.updateFromSnapshot(mainwindow, receiver), gui.dspPollRate)
+    scheduler.start()
+    app.exec_()
+    receiver.close()
 
-    #device_id=38 # input device to process -> should be commented out if previous line is active :o)
-    
-    # Update channel count based on actual device
-    n_chans = device_info['max_input_channels']
-    n_channel = n_chans
 
+def run(args):
+    from PyQt5 import QtWidgets
+    import radarCore as core
+    import radarGui as gui
+    import radarNet as net
 
-    stream = sd.InputStream(dtype=np.int32, device=device_id, channels=device_info['max_input_channels'],samplerate=device_info['default_samplerate'], callback=audio_callback)
+    app = QtWidgets.QApplication(sys.argv)
+    mainwindow = makeWindow(gui)
 
+    # reuse the device of the last run, or try to find the device automatically
+    search_keywords = ['CABLE Output', 'VB-Audio Virtual Cable', 'VB-Audio']
+    device_id, device_info = core.selectDevice(search_keywords)
+    # devices whose channels are aggregated to the main one
+    extra = core.selectExtraDevices(core.aggregateDevices, device_id)
 
-    with stream:
-        updateRadar(mainwindow)
+    #device_id=38 # input device to process -> should be commented out if previous line is active :o)
 
+    if core.dspProcess:
+        # capture and sector engine run in their own process, the GUI only reads the snapshot
+        snapshot = core.SectorSnapshot(len(core.prevmax))
+        stopDsp = multiprocessing.Event()
+        # the DSP process wakes the GUI through this socket pair when it leaves the idle state
+        wakeReader, wakeWriter = socket.socketpair()
+        dsp = multiprocessing.Process(target=core.dspMain, args=(snapshot.shm.name, device_id, device_info, stopDsp, extra, wakeWriter), daemon=True)
+        snapshotIdle = False
+
+        def poll():
+            nonlocal snapshotIdle
+            core.updateFromSnapshot(mainwindow, snapshot)
+            if snapshot.idle != snapshotIdle:
+                # the DSP loop went idle: poll at its idle rate until it wakes us up
+                snapshotIdle = snapshot.idle
+                scheduler.setRate(core.idleRate if snapshotIdle else gui.dspPollRate)
+                mainwindow.setIdle(snapshotIdle)
+        scheduler = gui.RadarScheduler(poll, gui.dspPollRate)
+        gui.WakeNotifier(wakeReader, scheduler.wake, mainwindow)
+    else:
+        stream = core.openStream(device_id, device_info, extra)
+        # the onsets and idle wake-ups are detected in the audio thread and queued to the GUI thread
+        onsetSignal = gui.OnsetSignal()
+        idle = core.IdleState(core.idleDelay, onsetSignal.wake.emit) if core.idleMode else None
+
+        def tick():
+            active = core.updateRadar(mainwindow)
+            stream.adapt() # grow the blocksize if the stream overflows
+            if idle is not None and idle.update(active):
+                # long silence: tick slowly until the audio thread wakes us up
+                scheduler.setRate(core.idleRate if idle.idle else core.refreshRate)
+                mainwindow.setIdle(idle.idle)
+        scheduler = gui.RadarScheduler(tick, core.refreshRate)
+        onsetSignal.wake.connect(scheduler.wake)
+        core.idleState = idle
+        if core.onsetDetection:
+            onsetSignal.onset.connect(scheduler.wake)
+            core.onsetDetector = core.OnsetDetector(core.n_chans, core.onsetRatio, core.onsetFloor, core.onsetAverage,
+                                                    core.onsetHoldoff, onsetSignal.onset.emit)
+        core.recorder = core.openRecorder()
+    publishUrl = args.publish or net.publishUrl
+    if publishUrl:
+        # the sector values of every tick are sent from background threads
+        core.publisher = net.SectorPublisher(publishUrl)
+        print(f"Publishing the radar on {publishUrl}")
+    stats = core.stats
+    if stats is not None:
+        # dump the stats on demand (SIGUSR1, or Ctrl+Break on Windows)
+        for name in ('SIGUSR1', 'SIGBREAK'):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), lambda signum, frame: stats.dump(core.statsFile))
+
+    if core.dspProcess:
+        dsp.start()
+        scheduler.start()
+        app.exec_()
+        stopDsp.set()
+        dsp.join(2)
+        snapshot.close()
+        wakeReader.close()
+        wakeWriter.close()
+    else:
+        with stream:
+            scheduler.start()
+            app.exec_()
+        if core.recorder is not None:
+            core.recorder.close()
+    if core.publisher is not None:
+        core.publisher.close()
+    if stats is not None and core.statsOnExit:
+        stats.dump(core.statsFile)
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Real-time 360° directional audio radar')
+    parser.add_argument('--replay', metavar='FILE', help='run headless on a recorded WAV, .npy or raw file instead of the input device')
+    parser.add_argument('--out', metavar='FILE', help='CSV file for the replay timeline (time and sector strengths)')
+    parser.add_argument('--samplerate', type=float, help='samplerate of a raw or .npy replay file')
+    parser.add_argument('--channels', type=int, help='number of channels of a raw replay file')
+    parser.add_argument('--dtype', default='int32', help='sample type of a raw replay file (default: int32)')
+    parser.add_argument('--blocksize', type=int, default=512, help='frames fed per audio block in replay (default: 512)')
+    parser.add_argument('--publish', metavar='URL', help='publish the sectors on udp://host:port (multicast or not) or ws://host:port')
+    parser.add_argument('--receive', metavar='URL', help='show the sectors published by another radar instead of the input device')
+    parser.add_argument('--timeline', metavar='FILE', help='show a recorded radar timeline (see recordTimeline) instead of the input device')
+    parser.add_argument('--speed', type=float, default=1., help='timeline playback speed, 1 to 50 (default: 1)')
+    parser.add_argument('--seek', type=float, default=0., help='timeline position to start from, in seconds')
+    args = parser.parse_args()
+
+    if args.replay:
+        replay(args)
+    elif args.timeline:
+        playTimeline(args)
+    elif args.receive:
+        receive(args)
+    else:
+        run(args)